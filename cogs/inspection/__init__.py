@@ -4,17 +4,91 @@
 Some utilites for code inspection.
 """
 
-import os
+import asyncio
+import logging
+import subprocess
 
+import discord
 
-async def get_source_revision():
-    """Retrieves the source version for the discord.py rewrite branch."""
+logger = logging.getLogger(__name__)
 
-    cmd = r'git ls-remote https://github.com/Rapptz/discord.py --tags rewrite HEAD~1..HEAD --format="%s (%cr)"'
-    if os.name == 'posix':
-        cmd = cmd.format(r'\`%h\`')
-    else:
-        cmd = cmd.format(r'`%h`')
-    revision = os.popen(cmd).read().strip()
+DISCORD_PY_REMOTE = 'https://github.com/Rapptz/discord.py'
+
+
+async def _git(*args, timeout=30):
+    process = await asyncio.create_subprocess_exec('git', *args, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+    try:
+        stdout, _ = await asyncio.wait_for(process.communicate(), timeout)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        raise
+
+    if process.returncode != 0:
+        raise RuntimeError(f'git {" ".join(args)} exited with return code {process.returncode}')
+
+    return stdout.decode('utf-8').strip()
+
+
+async def get_source_revision(*, mirror=None, ref='rewrite', timeout=30):
+    """Retrieves the source version for the discord.py rewrite branch.
+
+    If the path to a local git mirror is given, it is preferred over the remote.
+    """
+
+    if mirror:
+        try:
+            return await _git('-C', mirror, 'rev-parse', ref, timeout=timeout)
+        except (OSError, RuntimeError, asyncio.TimeoutError) as e:
+            logger.warning('Reading the revision from the mirror at %s failed due to %r', mirror, e)
+
+    revision = await _git('ls-remote', DISCORD_PY_REMOTE, f'refs/heads/{ref}', timeout=timeout)
+    if not revision:
+        raise RuntimeError(f'The remote has no branch called {ref}')
 
     return revision.split()[0]
+
+
+class SourceRevisionTracker:
+    """Keeps track of the discord.py source revision.
+
+    The last known revision is kept when it can't be retrieved, and failed attempts
+    are retried with an exponential backoff. Without any revision at all, the version
+    of the installed package is used instead.
+    """
+
+    def __init__(self, *, mirror=None, interval=3600, backoff=600, max_backoff=6 * 3600):
+        self.mirror = mirror
+        self.interval = interval
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        self.revision = None
+        self.failures = 0
+
+    @property
+    def delay(self):
+        """The time in seconds to wait until the next update."""
+
+        if not self.failures:
+            return self.interval
+
+        return min(self.backoff * 2 ** (self.failures - 1), self.max_backoff)
+
+    async def update(self):
+        """Retrieves and returns the current revision, or the cached one if that fails."""
+
+        try:
+            revision = await get_source_revision(mirror=self.mirror)
+        except (OSError, RuntimeError, asyncio.TimeoutError) as e:
+            self.failures += 1
+            logger.warning('Retrieving the discord.py source revision failed due to %r', e)
+
+            if self.revision is None:
+                self.revision = f'discord.py {discord.__version__}'
+        else:
+            self.failures = 0
+            self.revision = revision
+
+        return self.revision
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+
+"""
+A linear-time parser for the frames of Python tracebacks.
+
+Run this module directly to benchmark it against the regex it replaced.
+"""
+
+import collections
+
+Frame = collections.namedtuple('Frame', 'path lineno line')
+
+_FRAME_START = 'File "'
+_LINE_MARKER = ', line '
+
+
+def might_contain_traceback(text: str):
+    """A cheap check that rules out messages that can't contain a traceback frame."""
+
+    return _FRAME_START in text and _LINE_MARKER in text
+
+
+def _parse_frame_header(line: str):
+    # File "path", line 42, in function
+    end = line.find('"', len(_FRAME_START))
+    if end == -1 or not line.startswith(_LINE_MARKER, end + 1):
+        return None
+
+    start = end + 1 + len(_LINE_MARKER)
+    stop = line.find(',', start)
+    lineno = line[start:] if stop == -1 else line[start:stop]
+    if not lineno.isdigit():
+        return None
+
+    return line[len(_FRAME_START):end], int(lineno)
+
+
+class FrameParser:
+    """Parses the frames of tracebacks from text that arrives in chunks.
+
+    Lines longer than ``max_line_length`` are skipped, so the memory used
+    for buffering incomplete lines stays bounded.
+    """
+
+    def __init__(self, *, max_line_length: int = None):
+        self.max_line_length = max_line_length
+
+        self._buffer = ''
+        self._skipping = False
+        self._header = None
+
+    def _feed_line(self, line: str):
+        line = line.strip()
+        if not line:
+            return None
+
+        header = self._header
+        if line.startswith(_FRAME_START):
+            self._header = _parse_frame_header(line)
+            return header and Frame(*header, '')
+
+        if header:
+            self._header = None
+            return Frame(*header, line)
+
+        return None
+
+    def feed(self, text: str):
+        """Yields the frames that could be completed with a chunk of text."""
+
+        lines = (self._buffer + text).split('\n')
+        self._buffer = lines.pop()
+
+        for line in lines:
+            if self._skipping:
+                self._skipping = False
+                continue
+
+            frame = self._feed_line(line)
+            if frame:
+                yield frame
+
+        if self.max_line_length is not None and len(self._buffer) > self.max_line_length:
+            self._buffer = ''
+            self._skipping = True
+
+    def close(self):
+        """Yields the remaining frames once there is no more text."""
+
+        if not self._skipping:
+            frame = self._feed_line(self._buffer)
+            if frame:
+                yield frame
+
+        self._buffer = ''
+        if self._header:
+            yield Frame(*self._header, '')
+            self._header = None
+
+
+def iter_frames(text: str):
+    """Yields the frames of all tracebacks in a text.
+
+    The source line of a frame is empty if the traceback doesn't show it,
+    e.g. for code that was typed into the interactive interpreter.
+    """
+
+    parser = FrameParser()
+    yield from parser.feed(text)
+    yield from parser.close()
+
+
+def last_frame(text: str):
+    """Returns the innermost frame of the last traceback in a text, if there is one."""
+
+    if not might_contain_traceback(text):
+        return None
+
+    frame = None
+    for frame in iter_frames(text):
+        pass
+
+    return frame
+
+
+def _benchmark():
+    import random
+    import re
+    import string
+    import timeit
+
+    old_regex = re.compile(r"(?:Traceback.*)*[\n\s]+(?:File\s\"(.*)\",\sline\s(\d+)(?:,\sin\s.*)?)[\n\s]+(.*)")
+
+    def old(text):
+        matches = list(old_regex.finditer(text))
+        return matches[-1].groups() if matches else None
+
+    def new(text):
+        frame = last_frame(text)
+        return frame and (frame.path, str(frame.lineno), frame.line)
+
+    words = [''.join(random.choices(string.ascii_lowercase, k=random.randint(1, 9))) for _ in range(500)]
+    traceback = (
+        'Traceback (most recent call last):\n'
+        '  File "/usr/lib/python3.7/site-packages/discord/client.py", line 227, in _run_event\n'
+        '    await coro(*args, **kwargs)\n'
+        '  File "bot.py", line 12, in on_message\n'
+        '    await client.send_message(message.channel, "hi")\n'
+        'AttributeError: \'Client\' object has no attribute \'send_message\'\n'
+    )
+
+    corpora = {
+        'chat messages': [' '.join(random.choices(words, k=random.randint(1, 30))) for _ in range(5000)],
+        'large pastes': ['\n'.join(' '.join(random.choices(words, k=12)) for _ in range(2000)) for _ in range(20)],
+        'whitespace pastes': ['Traceback' + ' \n' * 5000 + 'line' for _ in range(5)],
+        'tracebacks': [f'```py\n{traceback}```' for _ in range(1000)],
+        'traceback pastes': ['\n'.join(random.choices(words, k=5000)) + traceback for _ in range(20)],
+    }
+
+    for name, corpus in corpora.items():
+        assert [old(text) for text in corpus] == [new(text) for text in corpus], name
+
+        old_time = timeit.timeit(lambda: [old(text) for text in corpus], number=1)
+        new_time = timeit.timeit(lambda: [new(text) for text in corpus], number=1)
+        print(f'{name:18} ({len(corpus):5} texts): regex {old_time * 1000:9.2f}ms, parser {new_time * 1000:9.2f}ms')
+
+
+if __name__ == '__main__':
+    _benchmark()
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+
+"""
+Linting of code in a pool of worker processes.
+
+Checking code with pyflakes and pycodestyle is pure CPU work that would block
+the event loop, and user code can be crafted to make it arbitrarily slow.
+The checks therefore run in a warm pool of worker processes that limit
+the CPU time and memory every job may use.
+"""
+
+import asyncio
+import collections
+import hashlib
+from concurrent.futures.process import BrokenProcessPool
+
+import pycodestyle
+from pyflakes import api as pyflakes
+
+from utils import limits
+
+Problem = collections.namedtuple('Problem', 'line column code message')
+
+_FILENAME = '<codeblock>'
+
+
+class LintTimeout(Exception):
+    """Raised when linting takes longer than allowed."""
+
+
+class TooManyJobs(Exception):
+    """Raised when a user already has as many lint jobs running as allowed."""
+
+
+# state of a worker process
+_style = None
+
+
+def _init_worker():
+    global _style
+
+    _style = pycodestyle.StyleGuide(quiet=True)
+
+
+def _warm_up():
+    pass
+
+
+class _Reporter:
+    """Collects the messages of pyflakes."""
+
+    def __init__(self):
+        self.problems = []
+
+    def unexpectedError(self, filename, message):
+        self.problems.append(Problem(1, 1, 'E902', str(message)))
+
+    def syntaxError(self, filename, message, lineno, offset, text):
+        self.problems.append(Problem(lineno or 1, offset or 1, 'E999', f'SyntaxError: {message}'))
+
+    def flake(self, message):
+        self.problems.append(Problem(message.lineno, message.col + 1, type(message).__name__, message.message % message.message_args))
+
+
+class _Report(pycodestyle.BaseReport):
+    """Collects the errors of pycodestyle."""
+
+    def __init__(self, options):
+        super().__init__(options)
+        self.problems = []
+
+    def error(self, line_number, offset, text, check):
+        code = super().error(line_number, offset, text, check)
+        if code:
+            self.problems.append(Problem(line_number, offset + 1, code, text[5:]))
+
+        return code
+
+
+def _lint(code: str, cpu_limit: int):
+    try:
+        with limits.cpu_time_limit(cpu_limit):
+            reporter = _Reporter()
+            pyflakes.check(code, _FILENAME, reporter)
+
+            report = _Report(_style.options)
+            pycodestyle.Checker(_FILENAME, lines=code.splitlines(keepends=True), options=_style.options, report=report).check_all()
+    except limits.CPUTimeExceeded:
+        raise LintTimeout() from None
+
+    return sorted(reporter.problems + report.problems)
+
+
+class Linter:
+    """Lints code in a warm process pool and caches the results.
+
+    Every job may use ``cpu_limit`` seconds of CPU time and ``memory_limit`` bytes of memory,
+    and may take ``timeout`` seconds in total. Each user may only have ``max_jobs_per_user``
+    jobs running at a time.
+    """
+
+    def __init__(self, *, loop=None, workers=2, cache_size=256, max_jobs_per_user=1,
+                 timeout=10, cpu_limit=5, memory_limit=256 * 1024 * 1024):
+        self.loop = loop or asyncio.get_event_loop()
+        self.workers = workers
+        self.cache_size = cache_size
+        self.max_jobs_per_user = max_jobs_per_user
+        self.timeout = timeout
+        self.cpu_limit = cpu_limit
+        self.memory_limit = memory_limit
+
+        self._executor = None
+        self._results = collections.OrderedDict()
+        self._jobs = collections.Counter()
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = limits.make_worker_pool(self.workers, memory_limit=self.memory_limit, initializer=_init_worker)
+
+            for _ in range(self.workers):
+                self._executor.submit(_warm_up)
+
+        return self._executor
+
+    def start(self):
+        """Starts the worker processes, so the first job doesn't have to wait for them."""
+
+        self._get_executor()
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    async def lint(self, user_id: int, code: str):
+        """Returns the problems pyflakes and pycodestyle find in some code."""
+
+        key = hashlib.blake2b(code.encode('utf-8'), digest_size=16).digest()
+        problems = self._results.get(key)
+        if problems is not None:
+            self._results.move_to_end(key)
+            return problems
+
+        if self._jobs[user_id] >= self.max_jobs_per_user:
+            raise TooManyJobs()
+
+        self._jobs[user_id] += 1
+        try:
+            future = self.loop.run_in_executor(self._get_executor(), _lint, code, self.cpu_limit)
+            problems = await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            raise LintTimeout() from None
+        except BrokenProcessPool:
+            # a worker died, most likely because of the memory limit
+            self.close()
+            raise
+        finally:
+            self._jobs[user_id] -= 1
+            if not self._jobs[user_id]:
+                del self._jobs[user_id]
+
+        self._results[key] = problems
+        if len(self._results) > self.cache_size:
+            self._results.popitem(last=False)
+
+        return problems
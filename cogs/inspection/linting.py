@@ -1,11 +1,20 @@
 # -*- coding: utf-8 -*-
 
-import discord
-import lxml.etree as etree
+import asyncio
 import typing
+from concurrent.futures.process import BrokenProcessPool
+
+import aiohttp
+import discord
 from discord.ext import commands
 
+from .lint import Linter, LintTimeout, TooManyJobs
+from .pep_index import PepIndex
+from .peps import PEP_URL, PepCache, PepUnavailable
+
 from core import commands as inspector
+from utils.converters import CodeblockConverter
+from utils.paginator import PaginatorInterface, WrappedPaginator
 
 _PYTHON_ICON = 'https://cdn.icon-icons.com/icons2/112/PNG/512/python_18894.png'
 
@@ -13,13 +22,17 @@ _PYTHON_ICON = 'https://cdn.icon-icons.com/icons2/112/PNG/512/python_18894.png'
 class Linting(metaclass=inspector.MetaCog, category='Inspection'):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
+        self.peps = PepCache(bot)
+        self.pep_index = PepIndex.load()
+        self.linter = Linter(loop=bot.loop)
+        self.linter.start()
 
-    @staticmethod
-    def _format_pep_embed(embed: discord.Embed, nodes: typing.Generator):
-        for node in nodes:
-            title = node.getchildren()[0].text
-            value = node.getchildren()[1].text
+    def __unload(self):
+        self.linter.close()
 
+    @staticmethod
+    def _format_pep_embed(embed: discord.Embed, fields: typing.List[typing.Tuple[str, str]]):
+        for title, value in fields:
             if title == 'PEP:':
                 continue
             elif title == 'Title:':
@@ -34,27 +47,71 @@ class Linting(metaclass=inspector.MetaCog, category='Inspection'):
 
         return embed
 
-    @inspector.command()
+    @inspector.group()
     async def pep(self, ctx: inspector.Context, index: int):
         """Provides a Python Enhancement Proposal (PEP) by index."""
 
-        def _get_nodes(page):
-            root = etree.fromstring(page, etree.HTMLParser())
-            return root.iterfind('.//table[@class="rfc2822 docutils field-list"]/tbody/tr[@class="field"]')
-
-        url = 'https://www.python.org/dev/peps/pep-{:04d}/'.format(index)
-        async with ctx.bot.session.get(url) as response:
-            if response.status != 200:
-                return await ctx.send('There\'s no such PEP out there.')
+        try:
+            entry = await self.peps.get(index)
+        except (aiohttp.ClientError, asyncio.TimeoutError, PepUnavailable):
+            return await ctx.send('Couldn\'t reach python.org, please try again later.')
 
-            text = await response.text(encoding='utf-8')
-
-        nodes = await ctx.bot.loop.run_in_executor(None, lambda: _get_nodes(text))
+        if entry is None:
+            return await ctx.send('There\'s no such PEP out there.')
 
         embed = discord.Embed(
-            url=url,
+            url=PEP_URL.format(index),
             description=f'**PEP:** {index}',
             colour=discord.Colour.blurple()
         )
 
-        await ctx.send(embed=self._format_pep_embed(embed, nodes))
+        await ctx.send(embed=self._format_pep_embed(embed, entry.fields))
+
+    @pep.command(name='search')
+    async def pep_search(self, ctx: inspector.Context, *, terms: str):
+        """Searches the PEPs for the given terms.
+
+        Terms with typos are replaced by similar terms that occur in PEPs.
+        """
+
+        if self.pep_index is None:
+            return await ctx.send('The PEP search index hasn\'t been built yet.')
+
+        results = self.pep_index.search(terms, limit=10)
+        if not results:
+            return await ctx.send('No PEP matches your search terms.')
+
+        embed = discord.Embed(title=f'PEPs matching "{terms}"', colour=discord.Colour.blurple())
+        embed.description = '\n'.join(
+            f'[**PEP {result.number}**]({PEP_URL.format(result.number)}) {result.title} `{result.status}`'
+            for result in results
+        )
+
+        corrections = {term: matches for term, matches in self.pep_index.corrections(terms).items() if matches}
+        if corrections:
+            text = ', '.join(f'{term} \N{RIGHTWARDS ARROW} {" / ".join(matches)}' for term, matches in corrections.items())
+            embed.set_footer(text=f'Corrected: {text}', icon_url=_PYTHON_ICON)
+
+        await ctx.send(embed=embed)
+
+    @inspector.command()
+    async def lint(self, ctx: inspector.Context, *, code: CodeblockConverter):
+        """Checks Python code for errors and style issues with pyflakes and pycodestyle."""
+
+        try:
+            problems = await self.linter.lint(ctx.author.id, code.content)
+        except TooManyJobs:
+            return await ctx.send('Please wait until your other code has been checked.')
+        except LintTimeout:
+            return await ctx.send('Checking your code took too long.')
+        except (MemoryError, BrokenProcessPool):
+            return await ctx.send('Checking your code took too much memory.')
+
+        if not problems:
+            return await ctx.send('\N{WHITE HEAVY CHECK MARK} No problems found.')
+
+        paginator = WrappedPaginator(prefix='```prolog', max_size=1985)
+        for problem in problems:
+            paginator.add_line(f'{problem.line}:{problem.column}: {problem.code} {problem.message}')
+
+        await PaginatorInterface(ctx.bot, paginator, owner=ctx.author).send_to(ctx)
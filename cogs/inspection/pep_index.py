@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+
+"""
+A compact offline full-text search index of Python Enhancement Proposals.
+
+The index is built from a local checkout of the PEP sources and/or the PEP headers
+the bot has cached. It is a marshalled file with the sorted vocabulary, the offsets
+of every term into the postings, and the postings themselves as packed pairs of
+document numbers and precomputed BM25 weights, so a search only has to sum up
+the weights of the query terms.
+"""
+
+import array
+import bisect
+import collections
+import heapq
+import marshal
+import math
+import pathlib
+import re
+
+from utils import fuzzy
+
+INDEX_PATH = pathlib.Path('data/pep_index.marshal')
+
+_INDEX_VERSION = 1
+_TOKEN_REGEX = re.compile(r'[a-z0-9]+')
+_FILE_REGEX = re.compile(r'^pep-(\d{4})\.(?:txt|rst)$')
+_STOP_WORDS = frozenset((
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'if', 'in', 'is', 'it', 'of', 'on', 'or',
+    'that', 'the', 'this', 'to', 'was', 'which', 'with',
+))
+
+# how much a token counts depending on where in the PEP it appears
+_TITLE_WEIGHT = 4
+_HEADER_WEIGHT = 2
+_BODY_WEIGHT = 1
+
+# BM25 parameters, weights are stored as fixed-point numbers
+_K1 = 1.2
+_B = 0.75
+_SCALE = 1000
+
+PepDocument = collections.namedtuple('PepDocument', 'number headers body')
+SearchResult = collections.namedtuple('SearchResult', 'number title status score')
+
+
+def tokenize(text: str):
+    """Splits a text into the terms the index uses."""
+
+    return [token for token in _TOKEN_REGEX.findall(text.lower()) if token not in _STOP_WORDS and len(token) < 32]
+
+
+def parse_pep_source(number: int, source: str):
+    """Splits the source of a PEP into its RFC 2822 style headers and its body."""
+
+    headers = []
+    lines = source.splitlines()
+    for index, line in enumerate(lines):
+        if not line.strip():
+            break
+
+        if line[0].isspace() and headers:
+            # a continuation of the previous header
+            name, value = headers[-1]
+            headers[-1] = (name, f'{value} {line.strip()}')
+        elif ':' in line:
+            name, _, value = line.partition(':')
+            headers.append((name.strip(), value.strip()))
+    else:
+        index = len(lines)
+
+    return PepDocument(number, headers, '\n'.join(lines[index:]))
+
+
+def iter_pep_sources(path: pathlib.Path):
+    """Yields the documents of all PEPs in a checkout of the PEP sources."""
+
+    for file in sorted(path.rglob('pep-*')):
+        match = _FILE_REGEX.match(file.name)
+        if match is None:
+            continue
+
+        number = int(match.group(1))
+        # PEP 0 is the index of all PEPs and would match almost everything
+        if number != 0:
+            yield parse_pep_source(number, file.read_text(encoding='utf-8'))
+
+
+def _term_frequencies(title: str, headers: dict, body: str):
+    """Counts the occurrences of each term in a PEP, weighted by where they occur."""
+
+    counter = collections.Counter()
+    for token in tokenize(title):
+        counter[token] += _TITLE_WEIGHT
+    for name, value in headers.items():
+        for token in tokenize(f'{name} {value}'):
+            counter[token] += _HEADER_WEIGHT
+    for token in tokenize(body):
+        counter[token] += _BODY_WEIGHT
+
+    return counter
+
+
+def build_pep_index(documents, path: pathlib.Path = INDEX_PATH):
+    """Builds the search index for an iterable of :class:`PepDocument` and returns its path.
+
+    A later document with the same number replaces an earlier one.
+    """
+
+    documents = {document.number: document for document in documents}
+    if not documents:
+        raise ValueError('There are no PEPs to index.')
+
+    peps = []
+    frequencies = []
+    for number in sorted(documents):
+        headers = dict(documents[number].headers)
+        title = headers.pop('Title', '')
+        headers.pop('PEP', None)
+        peps.append((number, title, headers.get('Status', '')))
+        frequencies.append(_term_frequencies(title, headers, documents[number].body))
+
+    lengths = [sum(counter.values()) for counter in frequencies]
+    average_length = sum(lengths) / len(lengths)
+
+    postings = collections.defaultdict(list)
+    for document, counter in enumerate(frequencies):
+        norm = _K1 * (1 - _B + _B * lengths[document] / average_length)
+        for term, frequency in counter.items():
+            postings[term].append((document, frequency * (_K1 + 1) / (frequency + norm)))
+
+    terms = sorted(postings)
+    offsets = array.array('I', [0])
+    packed = array.array('H')
+    for term in terms:
+        entries = postings[term]
+        idf = math.log(1 + (len(peps) - len(entries) + 0.5) / (len(entries) + 0.5))
+        for document, weight in entries:
+            packed.append(document)
+            packed.append(min(int(round(idf * weight * _SCALE)), 0xFFFF))
+        offsets.append(len(packed) // 2)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'wb') as f:
+        marshal.dump((_INDEX_VERSION, tuple(peps), tuple(terms), offsets.tobytes(), packed.tobytes()), f)
+
+    return path
+
+
+class PepIndex:
+    """A loaded PEP search index."""
+
+    def __init__(self, peps, terms, offsets, postings):
+        self.peps = peps
+        self.terms = terms
+        self._offsets = offsets
+        self._postings = postings
+
+    @classmethod
+    def load(cls, path: pathlib.Path = INDEX_PATH):
+        """Loads an index from disk. Returns None if it doesn't exist or is outdated."""
+
+        try:
+            with open(path, 'rb') as f:
+                version, peps, terms, offsets, postings = marshal.load(f)
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+
+        if version != _INDEX_VERSION:
+            return None
+
+        return cls(peps, terms, memoryview(offsets).cast('I'), memoryview(postings).cast('H'))
+
+    def __len__(self):
+        return len(self.peps)
+
+    def _term_id(self, term):
+        index = bisect.bisect_left(self.terms, term)
+        if index < len(self.terms) and self.terms[index] == term:
+            return index
+        return None
+
+    def _similar_terms(self, term, *, limit=3):
+        # only terms with the same first letter and a similar length are considered,
+        # which keeps the number of expensive comparisons low
+        start = bisect.bisect_left(self.terms, term[0])
+        stop = bisect.bisect_left(self.terms, chr(ord(term[0]) + 1))
+        candidates = [candidate for candidate in self.terms[start:stop] if abs(len(candidate) - len(term)) <= 2]
+
+        return fuzzy.extract_or_exact(term, candidates, scorer=fuzzy.ratio, score_cutoff=75, limit=limit)
+
+    def corrections(self, query: str):
+        """Returns a mapping of query terms that aren't in the index to the similar terms that are used instead."""
+
+        return {
+            term: [match for match, _ in self._similar_terms(term)]
+            for term in tokenize(query) if self._term_id(term) is None
+        }
+
+    def search(self, query: str, *, limit: int = 10):
+        """Returns the PEPs that match a query best.
+
+        Terms that aren't in the index are replaced by similar ones, weighted by their similarity.
+        """
+
+        scores = collections.defaultdict(int)
+        for term in tokenize(query):
+            term_id = self._term_id(term)
+            if term_id is not None:
+                matches = [(term_id, 100)]
+            else:
+                matches = [(self._term_id(match), score) for match, score in self._similar_terms(term)]
+
+            for term_id, similarity in matches:
+                postings = self._postings[self._offsets[term_id] * 2:self._offsets[term_id + 1] * 2]
+                for document, weight in zip(postings[::2], postings[1::2]):
+                    scores[document] += weight * similarity // 100
+
+        best = heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], -item[0]))
+        return [SearchResult(*self.peps[document], score / _SCALE) for document, score in best]
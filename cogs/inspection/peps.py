@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+
+"""
+Fetching and caching of the headers of Python Enhancement Proposals.
+"""
+
+import asyncio
+import collections
+import logging
+import time
+
+import aiohttp
+import lxml.etree as etree
+
+from utils import db
+
+logger = logging.getLogger(__name__)
+
+PEP_URL = 'https://www.python.org/dev/peps/pep-{:04d}/'
+
+# how long a PEP is served from memory before asking python.org whether it changed
+_REVALIDATE_AFTER = 3600
+_CHUNK_SIZE = 16 * 1024
+
+
+class Pep(db.Table):
+    number = db.Column(db.Integer, primary_key=True)
+    fields = db.Column(db.JSONB)
+    etag = db.Column(db.Text, nullable=True)
+    last_modified = db.Column(db.Text, nullable=True)
+
+
+PepEntry = collections.namedtuple('PepEntry', 'number fields etag last_modified')
+
+
+class PepUnavailable(Exception):
+    """Raised when python.org responds with an error to the request for a PEP."""
+
+
+def _is_header(element):
+    return element is not None and 'rfc2822' in (element.get('class') or '')
+
+
+def _text(element):
+    return ''.join(element.itertext()).strip() or None
+
+
+class PepHeaderParser:
+    """Incrementally parses the header table of a PEP page.
+
+    Both the old table layout and the newer definition list layout of the header are supported.
+    :attr:`done` is set as soon as the header has been parsed, the rest of the page can be skipped then.
+    """
+
+    def __init__(self):
+        self._parser = etree.HTMLPullParser(events=('end',))
+        self.fields = []
+        self.done = False
+
+    def feed(self, data: bytes):
+        self._parser.feed(data)
+
+        for _, element in self._parser.read_events():
+            if element.tag == 'tr' and element.get('class') == 'field':
+                cells = element.getchildren()
+                # malformed rows are skipped
+                if len(cells) >= 2 and _is_header(next(element.iterancestors('table'), None)):
+                    self.fields.append((_text(cells[0]), _text(cells[1])))
+
+            elif element.tag == 'dd' and _is_header(element.getparent()):
+                title = element.getprevious()
+                if title is not None:
+                    self.fields.append((_text(title), _text(element)))
+
+            elif element.tag in ('table', 'dl') and _is_header(element):
+                self.done = True
+                break
+
+
+class PepCache:
+    """A bounded in-memory LRU of PEP headers that is backed by the database.
+
+    Entries are revalidated against python.org with conditional requests once they
+    are older than an hour. If python.org can't be reached, cached entries are served anyway.
+    """
+
+    def __init__(self, bot, *, max_size=128):
+        self.bot = bot
+        self.max_size = max_size
+        self._entries = collections.OrderedDict()
+
+    def _put(self, entry):
+        self._entries[entry.number] = (entry, time.monotonic())
+        self._entries.move_to_end(entry.number)
+
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def _load(self, number):
+        row = await self.bot.pool.fetchrow('SELECT * FROM pep WHERE number = $1;', number)
+        if row is None:
+            return None
+
+        return PepEntry(row['number'], [tuple(field) for field in row['fields']], row['etag'], row['last_modified'])
+
+    async def _store(self, entry):
+        query = """
+            INSERT INTO pep (number, fields, etag, last_modified) VALUES ($1, $2, $3, $4)
+            ON CONFLICT (number) DO UPDATE
+            SET fields = EXCLUDED.fields, etag = EXCLUDED.etag, last_modified = EXCLUDED.last_modified;
+        """
+        await self.bot.pool.execute(query, *entry)
+
+    async def _fetch(self, number, entry):
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers['If-None-Match'] = entry.etag
+            if entry.last_modified:
+                headers['If-Modified-Since'] = entry.last_modified
+
+        async with self.bot.session.get(PEP_URL.format(number), headers=headers) as response:
+            if response.status == 304:
+                return entry
+            if response.status == 404:
+                return None
+            if response.status != 200:
+                raise PepUnavailable(f'python.org responded with status {response.status}')
+
+            parser = PepHeaderParser()
+            async for chunk in response.content.iter_chunked(_CHUNK_SIZE):
+                parser.feed(chunk)
+                if parser.done:
+                    break
+
+            entry = PepEntry(number, parser.fields, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+
+        await self._store(entry)
+        return entry
+
+    async def get(self, number: int):
+        """Returns the header of a PEP, or None if there is no such PEP.
+
+        Raises :exc:`PepUnavailable`, :exc:`aiohttp.ClientError` or :exc:`asyncio.TimeoutError`
+        if python.org can't be reached and the PEP isn't cached.
+        """
+
+        cached = self._entries.get(number)
+        if cached is not None:
+            entry, checked = cached
+            if time.monotonic() - checked < _REVALIDATE_AFTER:
+                self._entries.move_to_end(number)
+                return entry
+        else:
+            entry = await self._load(number)
+
+        try:
+            entry = await self._fetch(number, entry)
+        except (aiohttp.ClientError, asyncio.TimeoutError, PepUnavailable) as e:
+            if entry is None:
+                raise
+
+            logger.warning('Revalidating PEP %d failed due to %r, serving it from the cache', number, e)
+
+        if entry is None:
+            self._entries.pop(number, None)
+        else:
+            self._put(entry)
+
+        return entry
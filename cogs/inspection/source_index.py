@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+
+"""
+Compact on-disk indexes of the source lines of discord.py versions.
+
+An index file consists of a fixed-size header with the version name, followed
+by the sorted 64-bit hashes of every (module, line) pair of that version in native
+byte order. The bot memory-maps these files, so lookups are a binary search
+that doesn't need to read the whole index into memory.
+"""
+
+import array
+import bisect
+import hashlib
+import logging
+import mmap
+import os
+import pathlib
+import re
+import struct
+import tempfile
+import zipfile
+
+from .source_resolver import SourceResolver
+
+logger = logging.getLogger(__name__)
+
+INDEX_DIRECTORY = pathlib.Path('data/source_index')
+
+_MAGIC = b'CIDX\x00\x00\x00\x01'
+_HEADER = struct.Struct('8s56s')
+_VERSION_REGEX = re.compile(r"^__version__\s*=\s*['\"]([^'\"]+)['\"]", re.MULTILINE)
+
+
+def line_hash(module: str, line: str):
+    """Returns a hash of a source line that is stable across processes."""
+
+    digest = hashlib.blake2b(f'{module}\0{line}'.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+
+def _module_name(path: str):
+    """Returns the module name the traceback inspection uses for a path inside the discord package."""
+
+    parts = path.replace('\\', '/').split('/')
+    if parts[:-1] not in (['discord'], ['discord', 'ext', 'commands']):
+        return None
+
+    return parts[-1][:-3]
+
+
+def _iter_tree(path: pathlib.Path):
+    root = path / 'discord' if (path / 'discord').is_dir() else path
+    for file in root.rglob('*.py'):
+        yield f'discord/{file.relative_to(root).as_posix()}', file.read_text(encoding='utf-8')
+
+
+def _iter_wheel(path: pathlib.Path):
+    with zipfile.ZipFile(path) as wheel:
+        for name in wheel.namelist():
+            if name.startswith('discord/') and name.endswith('.py'):
+                yield name, wheel.read(name).decode('utf-8')
+
+
+def guess_version(path: pathlib.Path):
+    """Guesses the version of a discord.py source tree or wheel."""
+
+    if path.suffix == '.whl':
+        # discord.py-1.0.1-py3-none-any.whl
+        return path.name.split('-')[1]
+
+    for name, source in _iter_tree(path):
+        if name == 'discord/__init__.py':
+            match = _VERSION_REGEX.search(source)
+            if match:
+                return match.group(1)
+
+    return None
+
+
+def build_index(source: pathlib.Path, version: str, directory: pathlib.Path = INDEX_DIRECTORY):
+    """Builds the index for a discord.py source tree or wheel and returns its path."""
+
+    files = _iter_wheel(source) if source.suffix == '.whl' else _iter_tree(source)
+
+    hashes = set()
+    for name, text in files:
+        module = _module_name(name)
+        if module is None:
+            continue
+
+        for line in SourceResolver.cleanup_code(text.splitlines(keepends=True)):
+            hashes.add(line_hash(module, line))
+
+    if not hashes:
+        raise ValueError(f'{source} doesn\'t contain any discord.py sources.')
+
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f'{version}.idx'
+
+    # a running bot might have the old index mapped, so it must be replaced rather than rewritten
+    with tempfile.NamedTemporaryFile('wb', dir=directory, suffix='.tmp', delete=False) as f:
+        try:
+            f.write(_HEADER.pack(_MAGIC, version.encode('utf-8')))
+            array.array('Q', sorted(hashes)).tofile(f)
+        except BaseException:
+            f.close()
+            os.unlink(f.name)
+            raise
+
+    os.replace(f.name, path)
+    return path
+
+
+class SourceIndex:
+    """A memory-mapped index of the source lines of a single discord.py version."""
+
+    def __init__(self, path: pathlib.Path):
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < _HEADER.size or (size - _HEADER.size) % 8:
+                raise ValueError(f'{path} is truncated.')
+
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version = _HEADER.unpack_from(self._mmap)
+        if magic != _MAGIC:
+            self._mmap.close()
+            raise ValueError(f'{path} is not a source index.')
+
+        self.version = version.rstrip(b'\0').decode('utf-8')
+        self._hashes = memoryview(self._mmap)[_HEADER.size:].cast('Q')
+
+    def __len__(self):
+        return len(self._hashes)
+
+    def __contains__(self, item):
+        key = line_hash(*item)
+        index = bisect.bisect_left(self._hashes, key)
+        return index < len(self._hashes) and self._hashes[index] == key
+
+    @property
+    def family(self):
+        """The version family, async for versions before 1.0 and rewrite for everything else."""
+
+        return 'async' if self.version.split('.')[0] == '0' else 'rewrite'
+
+    def close(self):
+        self._hashes.release()
+        self._mmap.close()
+
+
+class SourceIndexes:
+    """All source indexes in a directory."""
+
+    def __init__(self, directory: pathlib.Path = INDEX_DIRECTORY):
+        self.indexes = []
+        for path in sorted(directory.glob('*.idx')):
+            try:
+                self.indexes.append(SourceIndex(path))
+            except (OSError, ValueError, UnicodeDecodeError) as e:
+                logger.warning('Skipping source index %s: %s', path, e)
+
+    def __bool__(self):
+        return bool(self.indexes)
+
+    def versions_for(self, module: str, line: str):
+        """Returns the indexes of all versions that contain a line in the given module."""
+
+        return [index for index in self.indexes if (module, line) in index]
+
+    def close(self):
+        for index in self.indexes:
+            index.close()
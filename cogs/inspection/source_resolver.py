@@ -1,63 +1,39 @@
 # -*- coding: utf-8 -*-
 
 import inspect
+import logging
+import marshal
 import os.path
 import pathlib
-import typing
 from collections import defaultdict
 
 import discord
-from discord.ext import commands
 
-Path = typing.NewType('Path', typing.Union[pathlib.Path, pathlib.PosixPath])
-
-
-def resolve_line(line, d):
-    for key in d.keys():
-        if any(line in l for l in d[key]):
-            return True
-
-    return False
+logger = logging.getLogger(__name__)
 
 
 class SourceResolver:
     """A helper class that is used to read and store the discord.py source lines."""
 
     PATH = pathlib.Path(os.path.dirname(inspect.getfile(discord)))
+    CACHE_PATH = pathlib.Path('data/source_cache.marshal')
+    # bump this whenever the layout of the cache or the cleanup of lines changes
+    CACHE_VERSION = 2
 
     def __init__(self):
         self.source = defaultdict(list)
+        self.exact = {}
 
     def __contains__(self, item):
-        return resolve_line(item, self.source)
+        return any(item in line for lines in self.source.values() for line in lines)
 
     def __getitem__(self, item):
         return self.source[item]
 
-    @staticmethod
-    def resolve_source_object(file: Path):
-        """Given a PosixPath object, this returns an object
-        that is compatible to :meth:`~inspect.getsourcelines`.
-
-        This also covers the `__init__.py` files of Python modules.
-        # TODO: Find a way to resolve the contents of `__main__.py`
-        """
-
-        parts = file.parts
-        name = file.name.rpartition('.')[0]
+    def has_line(self, module: str, line: str):
+        """Indicates whether a module contains exactly the given (stripped) line."""
 
-        if file.parts[-2] == 'commands':
-            # we're in discord.ext.commands
-            obj = (getattr(commands, name)
-                   if parts[-1] != '__init__.py'
-                   else commands)
-        else:
-            # we're in discord
-            obj = (getattr(discord, name)
-                   if parts[-1] != '__init__.py'
-                   else commands)
-
-        return name, obj
+        return line in self.exact.get(module, ())
 
     @staticmethod
     def cleanup_code(code: list):
@@ -86,13 +62,61 @@ class SourceResolver:
         ]
         return code
 
+    def _files(self):
+        return list(self.PATH.glob('*.py')) + list(self.PATH.joinpath('ext/commands').glob('*.py'))
+
+    def _cache_key(self, files):
+        stats = ((file.name, file.stat().st_mtime_ns, file.stat().st_size) for file in files)
+        return self.CACHE_VERSION, discord.__version__, str(self.PATH), tuple(sorted(stats))
+
+    def _set(self, source):
+        self.exact = {name: frozenset(lines) for name, lines in source.items()}
+        self.source = defaultdict(list, source)
+
+    def load_cache(self):
+        """Loads the source lines from the cache file.
+
+        Returns False if there is no cache for the installed sources.
+        """
+
+        try:
+            with open(self.CACHE_PATH, 'rb') as f:
+                key, source = marshal.load(f)
+        except (OSError, EOFError, ValueError, TypeError):
+            return False
+
+        if key != self._cache_key(self._files()):
+            return False
+
+        self._set(source)
+        return True
+
+    def save_cache(self):
+        """Stores the source lines in the cache file."""
+
+        state = (self._cache_key(self._files()), dict(self.source))
+
+        try:
+            self.CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.CACHE_PATH, 'wb') as f:
+                marshal.dump(state, f)
+        except OSError as e:
+            logger.warning('Storing the source cache failed due to %r', e)
+
     def read_source(self):
-        for file in list(self.PATH.glob('*.py')) + list(self.PATH.joinpath('ext/commands').glob('*.py')):
-            try:
-                name, obj = self.resolve_source_object(file)
-            except (AttributeError, TypeError):
-                continue
-
-            lines = inspect.getsourcelines(obj)[0]
-            obj = self.cleanup_code(lines)
-            self.source[name] = obj
+        """Reads the source lines of the installed discord.py version.
+
+        The files are read from disk, so updated sources are picked up without reloading any modules.
+        If they haven't changed since the last time, the cache file is used instead.
+        """
+
+        if self.load_cache():
+            return
+
+        source = {}
+        for file in self._files():
+            lines = file.read_text(encoding='utf-8').splitlines(keepends=True)
+            source[file.stem] = self.cleanup_code(lines)
+
+        self._set(source)
+        self.save_cache()
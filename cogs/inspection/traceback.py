@@ -1,80 +1,192 @@
 # -*- coding: utf-8 -*-
 
 import asyncio
-import importlib
+import codecs
+import collections
+import hashlib
 import re
+import time
 
 import discord
 from discord.ext import commands
 
-from . import get_source_revision
+from . import SourceRevisionTracker
+from .frames import FrameParser, last_frame, might_contain_traceback
+from .source_index import SourceIndexes
 from .source_resolver import SourceResolver
 
 from core import commands as inspector
 from utils.converters import CodeblockConverter
+from utils.formats import human_join
 
 _EXCLAMATION_ICON = 'https://twemoji.maxcdn.com/2/72x72/2757.png'
 
+# how many analysed codeblocks are remembered, and how long the same warning isn't repeated in a channel
+_MAX_ANALYSES = 512
+_WARNING_COOLDOWN = 600
+
+# attachments are streamed in chunks and only read up to a limit
+_ATTACHMENT_EXTENSIONS = ('.txt', '.log')
+_MAX_ATTACHMENT_SIZE = 8 * 1024 ** 2
+_CHUNK_SIZE = 64 * 1024
+_MAX_LINE_LENGTH = 4096
 
-class TracebackInspection(metaclass=inspector.MetaCog, category='Inspection'):
-    _TRACEBACK_REGEX = re.compile(r"(?:Traceback.*)*[\n\s]+(?:File\s\"(.*)\",\sline\s(\d+)(?:,\sin\s.*)?)[\n\s]+(.*)")
 
+class TracebackInspection(metaclass=inspector.MetaCog, category='Inspection'):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
         self.source_resolver = SourceResolver()
+        # cheap enough to do right away, so tracebacks can be inspected before the first update
+        self.source_resolver.load_cache()
         self.source_revision = None
+        self.revision_tracker = SourceRevisionTracker(mirror=bot.discord_py_mirror)
+        # built offline with `launch.py index build`
+        self.source_indexes = SourceIndexes()
+
+        self._analyses = collections.OrderedDict()
+        self._warnings = collections.OrderedDict()
 
         self.source_task = self.bot.loop.create_task(self._update_source())
 
     def __unload(self):
         self.source_task.cancel()
+        self.source_indexes.close()
 
     async def _update_source(self):
         while not self.bot.is_closed():
-            try:
-                revision = await get_source_revision()
-            except Exception:
-                await asyncio.sleep(600)
+            revision = await self.revision_tracker.update()
+
+            if self.source_revision != revision:
+                self.source_revision = revision
+                await self.bot.loop.run_in_executor(None, self.source_resolver.read_source)
+                self._analyses.clear()
+
+            await asyncio.sleep(self.revision_tracker.delay)
+
+    def _analyse_frame(self, frame):
+        """Returns the names of the matching versions if a frame is from a deprecated discord.py version, otherwise None."""
+
+        match = re.search(r"[\\/]([^\\/]*)[\\/]([^\\/]*)\.py", frame.path.strip())
+        if not match:
+            return None
+
+        is_discord_py_issue = match.group(1).strip() in ('discord', 'commands')
+        if not is_discord_py_issue:
+            return None
+
+        module = match.group(2).strip()
+        versions = []
+        if self.source_indexes:
+            versions = self.source_indexes.versions_for(module, frame.line)
+            is_async = bool(versions) and all(index.family == 'async' for index in versions)
+        else:
+            # when the line isn't part of the rewrite branch code lines, it must (obviously) be async
+            is_async = not self.source_resolver.has_line(module, frame.line)
+
+        return [index.version for index in versions] if is_async else None
+
+    def _analyse(self, key, content):
+        try:
+            result = self._analyses[key]
+        except KeyError:
+            frame = last_frame(content)
+            result = self._analyses[key] = frame and self._analyse_frame(frame)
+
+            if len(self._analyses) > _MAX_ANALYSES:
+                self._analyses.popitem(last=False)
+        else:
+            self._analyses.move_to_end(key)
+
+        return result
+
+    def _on_cooldown(self, channel, key):
+        now = time.monotonic()
+        last = self._warnings.get((channel.id, key))
+        if last is not None and now - last < _WARNING_COOLDOWN:
+            return True
+
+        self._warnings[(channel.id, key)] = now
+        self._warnings.move_to_end((channel.id, key))
+        if len(self._warnings) > _MAX_ANALYSES:
+            self._warnings.popitem(last=False)
+
+        return False
+
+    @staticmethod
+    def _warning_embed(versions):
+        embed = (discord.Embed(description='Please consider updating your installation to the rewrite branch (v1.0.0).', color=0xe74c3c)
+                 .set_author(name='Uh oh. Seems like you\'re using a deprecated version of discord.py!', icon_url=_EXCLAMATION_ICON)
+                 .add_field(name='Installation:', value='First, get [git](https://git-scm.com). Then you can use the command\n`'
+                                                        'python3.7 -m pip install git+https://github.com/Rapptz/discord.py@rewrite`.')
+                 .add_field(name='Documentation:', value='[Click here](http://discordpy.readthedocs.io/en/rewrite)')
+                 .add_field(name='Examples:', value='[Official examples](https://github.com/Rapptz/discord.py/tree/rewrite/examples)\n'
+                                                    '[Community examples](https://gist.github.com/EvieePy/d78c061a4798ae81be9825468fe146be)'))
+
+        if versions:
+            embed.add_field(name='Matching versions:', value=human_join(versions), inline=False)
+
+        return embed
+
+    async def _analyse_attachment(self, attachment: discord.Attachment):
+        """Streams an attachment and returns the first frame from a deprecated discord.py version along with its analysis."""
+
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        parser = FrameParser(max_line_length=_MAX_LINE_LENGTH)
+        size = 0
+
+        async with self.bot.session.get(attachment.url) as response:
+            if response.status != 200:
+                return None, None
+
+            async for chunk in response.content.iter_chunked(_CHUNK_SIZE):
+                size += len(chunk)
+                if size > _MAX_ATTACHMENT_SIZE:
+                    break
+
+                for frame in parser.feed(decoder.decode(chunk)):
+                    versions = self._analyse_frame(frame)
+                    if versions is not None:
+                        return frame, versions
+
+        for frame in parser.close():
+            versions = self._analyse_frame(frame)
+            if versions is not None:
+                return frame, versions
+
+        return None, None
+
+    async def _inspect_attachments(self, message: discord.Message):
+        for attachment in message.attachments:
+            if not attachment.filename.lower().endswith(_ATTACHMENT_EXTENSIONS):
                 continue
 
-            if self.source_revision == revision:
-                await asyncio.sleep(3600)
+            frame, versions = await self._analyse_attachment(attachment)
+            if versions is None:
                 continue
 
-            self.source_revision = revision
-            importlib.reload(discord)
+            key = hashlib.blake2b(repr(frame).encode('utf-8'), digest_size=16).digest()
+            if not self._on_cooldown(message.channel, key):
+                await message.channel.send(embed=self._warning_embed(versions))
 
-            self.source_resolver.read_source()
+            return
 
     async def on_message(self, message: discord.Message):
         """Inspects sent messages to give a warning about tracebacks
         that are caused by the discord.py async branch as it is deprecated."""
 
-        codeblock = await CodeblockConverter().convert(message, message.content)
-        matches = list(self._TRACEBACK_REGEX.finditer(codeblock.content))
-        if not matches:
-            return
-
-        path = matches[-1].group(1).strip()
-        line = matches[-1].group(3).strip()
+        if message.attachments:
+            await self._inspect_attachments(message)
 
-        match = re.search(r"[\\/]([^\\/]*)[\\/]([^\\/]*)\.py", path)
-        if not match:
+        # most messages are ordinary chat, so get rid of them as cheap as possible
+        if not might_contain_traceback(message.content):
             return
 
-        is_discord_py_issue = match.group(1).strip() in ('discord', 'commands')
-        if not is_discord_py_issue:
+        codeblock = await CodeblockConverter().convert(message, message.content)
+
+        # the same tracebacks tend to get pasted over and over again
+        key = hashlib.blake2b(codeblock.content.encode('utf-8'), digest_size=16).digest()
+        versions = self._analyse(key, codeblock.content)
+        if versions is None or self._on_cooldown(message.channel, key):
             return
 
-        # when the line isn't part of the rewrite branch code lines, it must (obviously) be async
-        is_async = line not in self.source_resolver[match.group(2).strip()]
-        if is_async:
-            embed = (discord.Embed(description='Please consider updating your installation to the rewrite branch (v1.0.0).', color=0xe74c3c)
-                     .set_author(name='Uh oh. Seems like you\'re using a deprecated version of discord.py!', icon_url=_EXCLAMATION_ICON)
-                     .add_field(name='Installation:', value='First, get [git](https://git-scm.com). Then you can use the command\n`'
-                                                            'python3.7 -m pip install git+https://github.com/Rapptz/discord.py@rewrite`.')
-                     .add_field(name='Documentation:', value='[Click here](http://discordpy.readthedocs.io/en/rewrite)')
-                     .add_field(name='Examples:', value='[Official examples](https://github.com/Rapptz/discord.py/tree/rewrite/examples)\n'
-                                                        '[Community examples](https://gist.github.com/EvieePy/d78c061a4798ae81be9825468fe146be)'))
-
-            await message.channel.send(embed=embed)
+        await message.channel.send(embed=self._warning_embed(versions))
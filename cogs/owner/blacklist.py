@@ -1,4 +1,10 @@
+import asyncio
+import csv
+import io
 import itertools
+import json
+import logging
+import tempfile
 import typing
 from datetime import datetime
 
@@ -8,7 +14,7 @@ from discord.ext import commands
 
 from core import commands as inspector
 from utils import db, converters
-from utils.paginator import PaginatorEmbedInterface, WrappedPaginator
+from utils.paginator import KeysetPaginatorInterface
 
 
 class Blacklist(db.Table):
@@ -17,6 +23,8 @@ class Blacklist(db.Table):
     reason = db.Column(db.Text, nullable=True)
 
 
+logger = logging.getLogger(__name__)
+
 _blocked_icon = 'https://twemoji.maxcdn.com/2/72x72/26d4.png'
 _unblocked_icon = 'https://twemoji.maxcdn.com/2/72x72/2705.png'
 
@@ -35,10 +43,71 @@ class Blacklisted(commands.CheckFailure):
 
 _GuildOrUser = typing.Union[converters.Guild, discord.User]
 
+# for the keyset pagination of the blacklist
+_MIN_SNOWFLAKE = -2 ** 63
+_PAGE_SIZE = 20
+
+
+def _parse_snowflakes(filename, data, default_reason):
+    """Parses the snowflakes and optional reasons from a CSV or JSON file.
+
+    JSON files may either contain a list of snowflakes or of objects with
+    a snowflake and a reason, CSV files contain a snowflake and an optional
+    reason per row.
+    """
+
+    text = data.decode('utf-8-sig')
+    if filename.lower().endswith('.json'):
+        rows = (
+            (entry['snowflake'], entry.get('reason')) if isinstance(entry, dict) else (entry, None)
+            for entry in json.loads(text)
+        )
+    else:
+        rows = ((row[0], row[1] if len(row) > 1 else None) for row in csv.reader(io.StringIO(text)) if row)
+
+    entries = {}
+    for snowflake, reason in rows:
+        try:
+            snowflake = int(snowflake)
+        except ValueError:
+            continue  # most likely a header
+
+        entries[snowflake] = reason or default_reason
+
+    return list(entries.items())
+
 
 class Blacklists(metaclass=inspector.MetaCog, category='Owner'):
+    # the commands keep the blacklist up to date, this only catches changes made elsewhere
+    _RESYNC_INTERVAL = 600
+
     def __init__(self, bot: commands.Bot):
         self.bot = bot
+        self._blacklist = {}
+        self._loaded = False
+        self._changes = 0
+
+        self.resync_task = self.bot.loop.create_task(self._resync())
+
+    def __unload(self):
+        self.resync_task.cancel()
+
+    async def _resync(self):
+        while not self.bot.is_closed():
+            changes = self._changes
+            try:
+                rows = await self.bot.pool.fetch('SELECT snowflake, reason FROM blacklist;')
+            except Exception as e:
+                logger.error('Loading the blacklist failed due to %r', e)
+            else:
+                # a command changed the blacklist in the meantime, so these rows might be outdated
+                if changes != self._changes:
+                    continue
+
+                self._blacklist = {row['snowflake']: row['reason'] for row in rows}
+                self._loaded = True
+
+            await asyncio.sleep(self._RESYNC_INTERVAL)
 
     async def __local_check(self, ctx: inspector.Context):
         if not await ctx.bot.is_owner(ctx.author):
@@ -46,16 +115,30 @@ class Blacklists(metaclass=inspector.MetaCog, category='Owner'):
         return True
 
     async def __global_check_once(self, ctx: inspector.Context):
-        row = await self.get_blacklist(ctx.author.id, con=ctx.db)
+        if not self._loaded:
+            # only happens until the blacklist has been loaded for the first time
+            return await self._check_from_db(ctx)
+
+        blacklist = self._blacklist
+        if ctx.author.id in blacklist:
+            raise Blacklisted('You have been blacklisted by my owner.', blacklist[ctx.author.id])
+
+        # the creator of the bot should be able to use it even on blocked guilds
+        if ctx.guild and ctx.guild.id in blacklist and ctx.author != ctx.bot.creator:
+            raise Blacklisted('This server has been blacklisted by my owner.', blacklist[ctx.guild.id])
+
+        return True
+
+    async def _check_from_db(self, ctx: inspector.Context):
+        row = await self.get_blacklist(ctx.author.id, con=ctx.cached)
         if row:
             raise Blacklisted('You have been blacklisted by my owner.', row['reason'])
 
         if not ctx.guild:
             return True
 
-        row = await self.get_blacklist(ctx.guild.id, con=ctx.db)
+        row = await self.get_blacklist(ctx.guild.id, con=ctx.cached)
         if row:
-            # the creator of the bot should be able to use it even on blocked guilds
             if ctx.author != ctx.bot.creator:
                 raise Blacklisted('This server has been blacklisted by my owner.', row['reason'])
 
@@ -95,10 +178,12 @@ class Blacklists(metaclass=inspector.MetaCog, category='Owner'):
         query = 'INSERT INTO blacklist VALUES ($1, $2, $3);'
 
         try:
-            await ctx.db.execute(query, server_or_user.id, time, reason)
+            await ctx.cached.execute(query, server_or_user.id, time, reason)
         except asyncpg.UniqueViolationError:
             return await ctx.send(f'{server_or_user} has already been blacklisted.')
         else:
+            self._blacklist[server_or_user.id] = reason
+            self._changes += 1
             await self._blacklist_embed(ctx, 'blacklisted', 0xff0000, _blocked_icon, server_or_user, reason, time)
 
     @inspector.command(aliases=['ubl', 'unblock'])
@@ -109,13 +194,70 @@ class Blacklists(metaclass=inspector.MetaCog, category='Owner'):
             return await ctx.send(f'You can\'t even block my owner, so you can\'t unblock him.')
 
         query = 'DELETE FROM blacklist WHERE snowflake = $1;'
-        result = await ctx.db.execute(query, server_or_user.id)
+        result = await ctx.cached.execute(query, server_or_user.id)
+        self._blacklist.pop(server_or_user.id, None)
+        self._changes += 1
 
         if result[-1] == '0':
             return await ctx.send(f'{server_or_user} isn\'t blacklisted.')
 
         await self._blacklist_embed(ctx, 'unblacklisted', 0x00FF00, _unblocked_icon, server_or_user, reason, datetime.utcnow())
 
+    @inspector.command(name='blacklist_import', aliases=['blimport'])
+    async def blacklist_import(self, ctx: inspector.Context, *, reason: str = ''):
+        """Blacklists all servers and users from an attached CSV or JSON file.
+
+        The reason is used for every entry that doesn't come with its own reason.
+        Snowflakes that are already blacklisted are skipped.
+        """
+
+        if not ctx.message.attachments:
+            return await ctx.send('Please attach a CSV or JSON file.')
+
+        attachment = ctx.message.attachments[0]
+        data = io.BytesIO()
+        await attachment.save(data)
+
+        try:
+            entries = await ctx.bot.loop.run_in_executor(None, _parse_snowflakes, attachment.filename, data.getvalue(), reason)
+        except (ValueError, KeyError, TypeError) as e:
+            return await ctx.send(f'Couldn\'t parse `{attachment.filename}`: {e}')
+
+        time = datetime.utcnow()
+        # the same users that CodeInspector.is_owner accepts
+        owners = set(ctx.bot.owners or ()) or {ctx.bot.app_info.owner.id}
+        records = [(snowflake, time, reason) for snowflake, reason in entries if snowflake not in owners]
+
+        # COPY can't handle conflicts, so the rows go through a temporary table first
+        async with ctx.db.transaction():
+            await ctx.db.execute('CREATE TEMPORARY TABLE blacklist_import (LIKE blacklist) ON COMMIT DROP;')
+            await ctx.db.copy_records_to_table('blacklist_import', records=records)
+
+            query = """
+                INSERT INTO blacklist SELECT * FROM blacklist_import
+                ON CONFLICT (snowflake) DO NOTHING
+                RETURNING snowflake, reason;
+            """
+            inserted = await ctx.db.fetch(query)
+
+        ctx.bot.query_cache.invalidate('blacklist')
+        self._blacklist.update((row['snowflake'], row['reason']) for row in inserted)
+        self._changes += 1
+
+        await ctx.send(f'Blacklisted {len(inserted)} of {len(records)} entries, '
+                       f'{len(records) - len(inserted)} were already blacklisted.')
+
+    @inspector.command(name='blacklist_export', aliases=['blexport'])
+    async def blacklist_export(self, ctx: inspector.Context):
+        """Exports the blacklist as a CSV file."""
+
+        # spills to disk if the blacklist gets large
+        with tempfile.SpooledTemporaryFile(max_size=8 * 1024 ** 2) as fp:
+            await ctx.db.copy_from_table('blacklist', output=fp, format='csv', header=True)
+            fp.seek(0)
+
+            await ctx.send(file=discord.File(fp, 'blacklist.csv'))
+
     @inspector.command()
     async def blacklisted(self, ctx: inspector.Context):
         """Lists all blacklisted users and guilds."""
@@ -131,14 +273,15 @@ class Blacklists(metaclass=inspector.MetaCog, category='Owner'):
 
             return f'`{index}.` Unknown guild/user'
 
-        snowflakes = [row['snowflake'] for row in (await ctx.db.fetch('SELECT snowflake FROM blacklist;'))]
-        entries = (
-            itertools.starmap(_get_user_or_guild, enumerate(snowflakes)) if snowflakes else
-            ('Currently no blacklisted users or guilds.',)
-        )
+        async def fetch_page(page, after):
+            # the interface outlives this command's connection, so the pool is used here
+            query = 'SELECT snowflake FROM blacklist WHERE snowflake > $1 ORDER BY snowflake LIMIT $2;'
+            rows = await ctx.bot.pool.fetch(query, _MIN_SNOWFLAKE if after is None else after, _PAGE_SIZE + 1)
+            if not rows and page == 0:
+                return ['Currently no blacklisted users or guilds.'], None
 
-        paginator = WrappedPaginator(prefix='', suffix='')
-        for entry in entries:
-            paginator.add_line(entry)
+            snowflakes = [row['snowflake'] for row in rows[:_PAGE_SIZE]]
+            lines = list(itertools.starmap(_get_user_or_guild, enumerate(snowflakes, page * _PAGE_SIZE)))
+            return lines, snowflakes[-1] if len(rows) > _PAGE_SIZE else None
 
-        return await PaginatorEmbedInterface(ctx.bot, paginator, owner=ctx.author).send_to(ctx)
+        return await KeysetPaginatorInterface(ctx.bot, fetch_page, owner=ctx.author).send_to(ctx)
@@ -3,6 +3,8 @@
 import asyncio
 import collections
 import contextlib
+import contextvars
+import functools
 import io
 import os
 import os.path
@@ -13,20 +15,30 @@ import traceback
 import typing
 
 import discord
+import humanize
 from discord.ext import commands
 
 from core import commands as inspector
-from utils.converters import Codeblock, CodeblockConverter, Guild
-from utils.db import PostgreSQLExecutor, TableFormat
+from utils.converters import Codeblock, CodeblockConverter, CodeblocksConverter, Guild, flag
+from utils.db import PlanFormat, PostgreSQLExecutor, TableFormat
 from utils.exception_handling import ReplResponseReactor
 from utils.formats import pluralize
 from utils.models import copy_context_with
 from utils.paginator import FilePaginator, PaginatorInterface, WrappedPaginator
-from utils.repl import AsyncCodeExecutor, Scope, all_inspections, get_var_dict_from_ctx
+from utils.repl import (AsyncCodeExecutor, IsolatedExecutor, OutputCapture, Profiler, ProfilerBusy, Scope, Timer,
+                        all_inspections, deep_sizeof, format_duration, get_var_dict_from_ctx)
 from utils.shell import ShellReader
 from utils.voice import BasicYTDLSource, connected_check, playing_check, vc_check, youtube_dl
 
-CommandTask = collections.namedtuple('CommandTask', 'index ctx task')
+# how many objects memsize may visit per result
+MAX_MEMSIZE_OBJECTS = 1000000
+
+CommandTask = collections.namedtuple('CommandTask', 'index ctx task running')
+
+# pyflakes takes strings in annotations for forward references, so the flags are created out here
+ExplainFlag = flag('--explain', '-e')
+IsolatedFlag = flag('--isolated', '-i')
+MemoryFlag = flag('--memory', '-m')
 
 
 class Owner(metaclass=inspector.MetaCog, category='Owner'):
@@ -39,6 +51,11 @@ class Owner(metaclass=inspector.MetaCog, category='Owner'):
         self.last_result = None
         self._tasks = collections.deque()
         self.task_count = 0
+        # the worker processes are only started once isolated code is executed
+        self.isolated_executor = IsolatedExecutor(loop=bot.loop)
+
+    def __unload(self):
+        self.isolated_executor.close()
 
     @property
     def scope(self):
@@ -49,7 +66,7 @@ class Owner(metaclass=inspector.MetaCog, category='Owner'):
     @contextlib.contextmanager
     def submit(self, ctx: inspector.Context):
         self.task_count += 1
-        cmd_task = CommandTask(self.task_count, ctx, asyncio.Task.current_task())
+        cmd_task = CommandTask(self.task_count, ctx, asyncio.Task.current_task(), set())
         self._tasks.append(cmd_task)
 
         try:
@@ -69,6 +86,49 @@ class Owner(metaclass=inspector.MetaCog, category='Owner'):
         return ''.join(re.sub(r'File ".*[\\/]([^\\/]+.py)"', r'File "\1"', line)
                        for line in traceback.format_exception(type(error), error, error.__traceback__))
 
+    @staticmethod
+    async def cancel_statements(ctx: inspector.Context, cmd_task: CommandTask):
+        """Cancels the queries a task is running on the server side."""
+
+        con = cmd_task.ctx.db
+        if not cmd_task.running or con is None:
+            return False
+
+        return await ctx.db.fetchval('SELECT pg_cancel_backend($1);', con.get_server_pid())
+
+    async def run_with_output(self, func, callback):
+        """Runs a coroutine function while passing its output to an async callback in batches.
+
+        Returns the result, the exception raised by the function if there was one, and the remaining output.
+        """
+
+        # the streamer and the paginator tasks it creates must not write into the capture
+        context = contextvars.copy_context()
+        with OutputCapture() as output:
+            streamer = context.run(self.bot.loop.create_task, output.stream(callback))
+            try:
+                result, error = await func(), None
+            except Exception as e:
+                result, error = None, e
+
+        # a batch might still be on its way
+        await streamer
+        return result, error, output.read()
+
+    @staticmethod
+    async def stream_output(ctx: inspector.Context, interface: PaginatorInterface, content: str):
+        """Adds output to a paginator interface, which is only sent once there is some."""
+
+        content = content.replace(ctx.bot.http.token, '<Token omitted>').rstrip('\n')
+        if not content:
+            return
+
+        if interface.message is None:
+            interface.paginator.add_line(content)
+            await interface.send_to(ctx)
+        else:
+            await interface.add_line(content)
+
     async def __local_check(self, ctx: inspector.Context):
         if not await ctx.bot.is_owner(ctx.author):
             raise commands.NotOwner('You must own this bot to use this command.')
@@ -125,6 +185,8 @@ class Owner(metaclass=inspector.MetaCog, category='Owner'):
         for task in self._tasks:
             paginator.add_line(f'{task.index}: `{task.ctx.command.qualified_name}`, invoked at '
                                f'{task.ctx.message.created_at.strftime("%Y-%m-%d %H:%M:%S")} UTC.')
+            for statement in task.running:
+                paginator.add_line(f'    running `{statement[:100]}`')
 
         await PaginatorInterface(ctx.bot, paginator, owner=ctx.author).send_to(ctx)
 
@@ -147,9 +209,12 @@ class Owner(metaclass=inspector.MetaCog, category='Owner'):
             else:
                 return await ctx.send('Unknown task.')
 
+        # the backend has to be cancelled first, the connection is released once the task is done
+        cancelled_statements = await self.cancel_statements(ctx, task)
         task.task.cancel()
+        queries = ' Its running queries were cancelled as well.' if cancelled_statements else ''
         await ctx.send(f'Cancelled task {task.index}: `{task.ctx.command.qualified_name}`, '
-                       f'invoked at {task.ctx.message.created_at.strftime("%Y-%m-%d %H:%M:%S")} UTC.')
+                       f'invoked at {task.ctx.message.created_at.strftime("%Y-%m-%d %H:%M:%S")} UTC.{queries}')
 
     @inspector.command()
     async def retain(self, ctx: inspector.Context, *, toggle: bool):
@@ -194,29 +259,31 @@ class Owner(metaclass=inspector.MetaCog, category='Owner'):
 
         func = env['_eval']
 
+        interface = PaginatorInterface(ctx.bot, WrappedPaginator(prefix='```py', max_size=1985), owner=ctx.author)
+        stream_output = functools.partial(self.stream_output, ctx, interface)
+
         async with ReplResponseReactor(ctx.message):
             with self.submit(ctx):
-                with io.StringIO() as stdout:
-                    try:
-                        with contextlib.redirect_stdout(stdout):
-                            result = await func()
-                    except Exception as e:
-                        value = stdout.getvalue()
-
-                        await safe_send(f'{value}{self.format_tb(e)}')
-                    else:
-                        value = stdout.getvalue()
+                result, error, value = await self.run_with_output(func, stream_output)
+                if error is not None:
+                    value = f'{value}{self.format_tb(error)}'
+                elif result:
+                    self.last_result = result
+                    value = f'{value}{result}'
 
-                        if not result:
-                            if value:
-                                await safe_send(value)
-                        else:
-                            self.last_result = result
-                            await safe_send(f'{value}{result}')
+                if interface.message is not None:
+                    await stream_output(value)
+                elif value:
+                    await safe_send(value)
 
     @inspector.command(aliases=['py'])
-    async def python(self, ctx: inspector.Context, *, code: CodeblockConverter):
-        """Direct evaluation of Python code."""
+    async def python(self, ctx: inspector.Context, isolated: typing.Optional[IsolatedFlag] = False, *,
+                     code: CodeblockConverter):
+        """Direct evaluation of Python code.
+
+        Passing `--isolated` executes the code in a separate process with limited CPU time and memory.
+        Isolated code can't access the bot or the REPL scope and only returns primitives or reprs.
+        """
 
         arg_dict = get_var_dict_from_ctx(ctx)
         scope = self.scope
@@ -227,7 +294,12 @@ class Owner(metaclass=inspector.MetaCog, category='Owner'):
         # Huge fuckery, but contextmanagers are our best shot.
         async with ReplResponseReactor(ctx.message):
             with self.submit(ctx):
-                async for result in AsyncCodeExecutor(code.content, scope, arg_dict=arg_dict):
+                if isolated:
+                    executor = self.isolated_executor.execute(code.content)
+                else:
+                    executor = AsyncCodeExecutor(code.content, scope, arg_dict=arg_dict)
+
+                async for result in executor:
                     if result is None:
                         continue
 
@@ -279,11 +351,137 @@ class Owner(metaclass=inspector.MetaCog, category='Owner'):
 
                     paginator = WrappedPaginator(prefix=f'```prolog\n=== {header} ===\n', max_size=1985)
 
-                    for name, res in all_inspections(result):
+                    async for name, res in all_inspections(result, loop=self.bot.loop):
                         paginator.add_line(f'{name:16.16} :: {res}')
 
                     await PaginatorInterface(ctx.bot, paginator, owner=ctx.author).send_to(ctx)
 
+    @inspector.command()
+    async def memsize(self, ctx: inspector.Context, *, code: CodeblockConverter):
+        """Shows how much memory the results of Python code retain.
+
+        The size includes everything the results own through containers, `__dict__` and `__slots__`,
+        and is broken down into the children that retain the most memory. Objects that are shared,
+        such as modules, classes and functions, aren't counted.
+        """
+
+        arg_dict = get_var_dict_from_ctx(ctx)
+        scope = self.scope
+
+        scope.clean()
+        arg_dict['_'] = self.last_result
+
+        async with ReplResponseReactor(ctx.message):
+            with self.submit(ctx):
+                async for result in AsyncCodeExecutor(code.content, scope, arg_dict=arg_dict):
+                    self.last_result = result
+
+                    header = repr(result).replace(ctx.bot.http.token, '<Token omitted>')
+                    if len(header) > 485:
+                        header = header[0:482] + '...'
+
+                    # traversing large objects takes a while, so keep it off the event loop
+                    usage = await self.bot.loop.run_in_executor(
+                        None, functools.partial(deep_sizeof, result, max_objects=MAX_MEMSIZE_OBJECTS, top=15)
+                    )
+
+                    paginator = WrappedPaginator(prefix=f'```prolog\n=== {header} ===\n', max_size=1985)
+                    paginator.add_line(
+                        f'{"At least " if not usage.complete else ""}{humanize.naturalsize(usage.size, binary=True)} '
+                        f'in {usage.objects:,} objects', empty=True
+                    )
+
+                    if usage.children:
+                        paginator.add_line(f'--- Largest children ---\n{"size":>10} {"share":>6}  child')
+                        for label, size in usage.children:
+                            label = label if len(label) <= 80 else label[:77] + '...'
+                            share = size * 100 / usage.size
+                            paginator.add_line(f'{humanize.naturalsize(size, binary=True):>10} {share:>5.1f}\uFF05  {label}')
+
+                    await PaginatorInterface(ctx.bot, paginator, owner=ctx.author).send_to(ctx)
+
+    @inspector.command(aliases=['pyprof'])
+    async def pyprofile(self, ctx: inspector.Context, memory: typing.Optional[MemoryFlag] = False, *,
+                        code: CodeblockConverter):
+        """Profiles the evaluation of Python code.
+
+        Shows the functions that took the most time, including the coroutines the code awaits.
+        Passing `--memory` additionally traces memory allocations.
+        """
+
+        arg_dict = get_var_dict_from_ctx(ctx)
+        scope = self.scope
+
+        scope.clean()
+        arg_dict['_'] = self.last_result
+
+        async with ReplResponseReactor(ctx.message):
+            with self.submit(ctx):
+                profiler = Profiler(memory=memory)
+                start = time.perf_counter()
+                try:
+                    results = await profiler.run(AsyncCodeExecutor(code.content, scope, arg_dict=arg_dict))
+                except ProfilerBusy as e:
+                    return await ctx.send(str(e))
+                elapsed = time.perf_counter() - start
+
+                if results:
+                    self.last_result = results[-1]
+
+                header = repr(self.last_result if results else None).replace(ctx.bot.http.token, '<Token omitted>')
+                if len(header) > 485:
+                    header = header[0:482] + '...'
+
+                paginator = WrappedPaginator(prefix=f'```prolog\n=== {header} ===\n', max_size=1985)
+                paginator.add_line(f'Finished in {elapsed * 1000:.2f}ms', empty=True)
+
+                for title, sort in (('Cumulative time', 'cumulative'), ('Total time', 'total')):
+                    paginator.add_line(f'--- {title} ---\n{"calls":>8} {"total":>10} {"cumul.":>10}  function')
+                    for stats in profiler.top_functions(sort):
+                        paginator.add_line(f'{stats.calls:>8} {stats.total_time:>10.6f} {stats.cumulative_time:>10.6f}  {stats.location}')
+                    paginator.add_line()
+
+                if memory:
+                    paginator.add_line(f'--- Allocations ---\n{"size":>10} {"blocks":>8}  line')
+                    for stats in profiler.top_allocations():
+                        paginator.add_line(f'{humanize.naturalsize(stats.size):>10} {stats.count:>8}  {stats.location}')
+
+                await PaginatorInterface(ctx.bot, paginator, owner=ctx.author).send_to(ctx)
+
+    @inspector.command()
+    async def timeit(self, ctx: inspector.Context, *, code: CodeblocksConverter):
+        """Measures how long Python code takes to run.
+
+        The number of loops is chosen automatically, and the measurement is repeated up to 7 times
+        as long as that takes less than 10 seconds. The code may await coroutines. If two codeblocks
+        are passed, the first one is used as setup code that runs once in the REPL scope before the measurement.
+        """
+
+        if len(code) > 2:
+            return await ctx.send('Please pass at most two codeblocks, the setup and the code to time.')
+
+        *setup, stmt = code
+
+        arg_dict = get_var_dict_from_ctx(ctx)
+        scope = self.scope
+
+        scope.clean()
+        arg_dict['_'] = self.last_result
+
+        async with ReplResponseReactor(ctx.message):
+            with self.submit(ctx):
+                if setup:
+                    async for _ in AsyncCodeExecutor(setup[0].content, scope, arg_dict=arg_dict):
+                        pass
+
+                result = await Timer(stmt.content, scope, arg_dict=arg_dict).repeat(7)
+
+                await ctx.send(
+                    f'{result.number:,} loops, {pluralize(repeat=len(result.timings))}: '
+                    f'min {format_duration(result.min)}, median {format_duration(result.median)}, '
+                    f'p95 {format_duration(result.p95)}, stdev {format_duration(result.stdev)} per loop'
+                )
+
     @inspector.command(aliases=['sh'])
     async def shell(self, ctx: inspector.Context, *, script: CodeblockConverter):
         """Executes statements in the system shell.
@@ -309,17 +507,24 @@ class Owner(metaclass=inspector.MetaCog, category='Owner'):
 
                 await interface.add_line(f'\n[Status] Return code {reader.close_code}')
 
-    @inspector.command()
-    async def sql(self, ctx: inspector.Context, *, query: CodeblockConverter):
-        """Executes SQL queries and displays their results in a rST table."""
+    @inspector.command(statement_timeout=120)
+    async def sql(self, ctx: inspector.Context, explain: typing.Optional[ExplainFlag] = False, *,
+                  query: CodeblockConverter):
+        """Executes SQL queries and displays their results in a rST table.
+
+        Passing `--explain` runs the queries through `EXPLAIN ANALYZE` and displays their plan trees instead.
+        """
 
         async with ReplResponseReactor(ctx.message):
-            with self.submit(ctx):
+            with self.submit(ctx) as cmd_task:
                 paginator = WrappedPaginator(prefix='```', max_size=1985)
 
-                async for total, result in PostgreSQLExecutor(ctx, query.content):
+                async for total, result in PostgreSQLExecutor(ctx, query.content, explain=explain, running=cmd_task.running):
                     paginator.add_line(f'# {query.content}\n')
-                    if not result or len(result) <= 0:
+                    if explain:
+                        plan = PlanFormat(result)
+                        paginator.add_line(f'{plan.render()}\n{plan.summary()}', empty=True)
+                    elif not result or len(result) <= 0:
                         paginator.add_line(f'{total:.2f}ms: {result}\n')
                     else:
                         num_rows = len(result)
@@ -335,6 +540,20 @@ class Owner(metaclass=inspector.MetaCog, category='Owner'):
 
                     await PaginatorInterface(ctx.bot, paginator, owner=ctx.author).send_to(ctx)
 
+    @inspector.command(aliases=['qc'])
+    async def querycache(self, ctx: inspector.Context, clear: bool = False):
+        """Shows the statistics of the query result cache, optionally clearing it."""
+
+        cache = ctx.bot.query_cache
+        stats = cache.stats
+        if clear:
+            cache.clear()
+
+        total = stats.hits + stats.misses
+        await ctx.send(f'{pluralize(entry=stats.size)} cached, {stats.hits}/{total} hits '
+                       f'({stats.hits * 100 / (total or 1):.1f}%), {pluralize(eviction=stats.evictions)}, '
+                       f'{pluralize(invalidation=stats.invalidations)}.' + (' Cache cleared.' if clear else ''))
+
     @inspector.command()
     async def git(self, ctx: inspector.Context, *, command: CodeblockConverter):
         """Shortcut for `ci!sh git`. Invokes the system shell."""
@@ -80,6 +80,9 @@ class CodeInspector(commands.AutoShardedBot):
         )
         self.start_time = datetime.utcnow()
         self.pool = self.loop.run_until_complete(db.create_pool(config['pg_credentials']))
+        self.query_cache = db.QueryCache(**(config.get('query_cache') or {}))
+        self.statement_timeouts = config.get('statement_timeouts') or {}
+        self.discord_py_mirror = config.get('discord_py_mirror')
         self.process = psutil.Process(os.getpid())
         self.token = config['token']
         self.webhook_url = config['webhook_url']
@@ -111,16 +111,45 @@ class Context(commands.Context):
 
         return self.bot.pool
 
+    @property
+    def cached(self):
+        """The current database connection, or the pool if none is acquired, reading through the bot's query cache."""
+
+        return self.bot.query_cache.bind(self.db or self.pool)
+
     @property
     def clean_prefix(self):
         """The cleaned up invoke prefix."""
 
         return self.prefix.replace(self.bot.user.mention, f'@{self.bot.user.name}')
 
+    @property
+    def statement_timeout(self):
+        """The statement timeout in seconds for the invoked command, if there is one.
+
+        The bot's config takes precedence over the timeout passed to the command.
+        """
+
+        command = self.command
+        if command is None:
+            return None
+
+        timeout = self.bot.statement_timeouts.get(command.qualified_name)
+        if timeout is None:
+            timeout = getattr(command, 'statement_timeout', None)
+
+        return timeout
+
     async def _acquire(self, *, timeout=None):
         if not self.db:
             self.db = await self.pool.acquire(timeout=timeout)
 
+            # the pool resets the setting when the connection gets released
+            statement_timeout = self.statement_timeout
+            if statement_timeout:
+                query = "SELECT set_config('statement_timeout', $1, false);"
+                await self.db.execute(query, f'{int(statement_timeout * 1000)}ms')
+
         return self.db
 
     def acquire(self, *, timeout=None):
@@ -188,6 +217,7 @@ class Context(commands.Context):
 
 class Command(commands.Command):
     def __init__(self, name, callback, **kwargs):
+        self.statement_timeout = kwargs.pop('statement_timeout', None)
         super().__init__(name, callback, **kwargs)
 
     async def can_run(self, ctx: commands.Context):
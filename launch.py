@@ -11,6 +11,7 @@ import traceback
 from datetime import datetime
 from pathlib import Path
 
+import asyncpg
 import click
 import yaml
 
@@ -87,7 +88,7 @@ def run_bot(stream_log: bool = False, *, ci: bool = False, **bot_config):
 async def init_db(quiet: bool = True):
     from utils.scheduler import Schedule  # we need to do this to make all_tables recognise the table
 
-    pool = await database.create_pool(config['postgresql'])
+    pool = await database.create_pool(config['pg_credentials'])
     con = await pool.acquire()
 
     async with con.transaction():
@@ -98,6 +99,12 @@ async def init_db(quiet: bool = True):
             await pool.execute(query)
 
     await pool.release(con)
+
+    for table in database.all_tables():
+        for query in table.create_concurrent_sql():
+            if not quiet:
+                logging.info('Creating index for table %s\nusing query %r', table.__tablename__, query)
+            await pool.execute(query)
     del Schedule
 
 
@@ -175,5 +182,90 @@ def init(cogs: str, quiet: bool):
     loop.run_until_complete(init_db(quiet))
 
 
+@main.group(short_help='discord.py source indexes', options_metavar='[options]')
+def index():
+    """A command group for the discord.py source indexes of the traceback inspection."""
+
+    pass
+
+
+@index.command(short_help='builds the source index of a discord.py version', options_metavar='[options]')
+@click.argument('sources', nargs=-1, metavar='[sources]', type=click.Path(exists=True))
+@click.option('-v', '--version', help='the version name, guessed from the sources if omitted')
+def build(sources: str, version: str):
+    """Builds source indexes for discord.py versions.
+
+    Each source can either be a discord.py source tree or a wheel.
+    """
+
+    from cogs.inspection.source_index import build_index, guess_version
+
+    if not sources:
+        click.echo('No sources specified.')
+        return
+
+    for source in map(Path, sources):
+        name = version or guess_version(source)
+        if not name:
+            click.echo(f'Couldn\'t guess the version of {source}, please pass it with --version.', err=True)
+            continue
+
+        try:
+            path = build_index(source, name)
+        except (OSError, ValueError, UnicodeDecodeError) as e:
+            click.echo(f'Could not index {source}: {e}', err=True)
+        else:
+            click.echo(f'Indexed {source} as {name} into {path}.')
+
+
+async def cached_peps():
+    from cogs.inspection.pep_index import PepDocument
+
+    pool = await database.create_pool(config['pg_credentials'])
+    try:
+        rows = await pool.fetch('SELECT number, fields FROM pep;')
+    finally:
+        await pool.close()
+
+    return [PepDocument(row['number'], [(title.rstrip(':'), value or '') for title, value in row['fields']], '') for row in rows]
+
+
+@main.group(short_help='PEP search index', options_metavar='[options]')
+def pep():
+    """A command group for the full-text search index of PEPs."""
+
+    pass
+
+
+@pep.command(name='build', short_help='builds the PEP search index', options_metavar='[options]')
+@click.argument('checkout', required=False, metavar='[checkout]', type=click.Path(exists=True, file_okay=False))
+@click.option('--cached/--no-cached', help='whether to include the PEP headers cached in the database', default=True)
+def build_peps(checkout: str, cached: bool):
+    """Builds the PEP search index.
+
+    PEPs are read from a local checkout of https://github.com/python/peps,
+    the headers that are cached in the database fill in PEPs that are missing from it.
+    """
+
+    from cogs.inspection.pep_index import build_pep_index, iter_pep_sources
+
+    documents = []
+    if cached:
+        try:
+            documents = loop.run_until_complete(cached_peps())
+        except (OSError, asyncio.TimeoutError, asyncpg.PostgresError) as e:
+            click.echo(f'Could not read the cached PEPs from the database: {e}\nPass --no-cached to skip them.', err=True)
+            return
+    if checkout:
+        documents.extend(iter_pep_sources(Path(checkout)))
+
+    try:
+        path = build_pep_index(documents)
+    except (OSError, ValueError, UnicodeDecodeError) as e:
+        click.echo(f'Could not build the PEP index: {e}', err=True)
+    else:
+        click.echo(f'Indexed {len({document.number for document in documents})} PEPs into {path}.')
+
+
 if __name__ == '__main__':
     sys.exit(main())
@@ -6,10 +6,11 @@ import re
 import discord
 from discord.ext import commands
 
-__all__ = ['Codeblock', 'CodeblockConverter', 'Guild', 'MessageConverter']
+__all__ = ['Codeblock', 'CodeblockConverter', 'CodeblocksConverter', 'Guild', 'MessageConverter', 'flag']
 
 Codeblock = collections.namedtuple('Codeblock', 'language content')
 CODEBLOCK_REGEX = re.compile("^(?:```([A-Za-z0-9\\-.]*)\n)?(.+?)(?:```)?$", re.S)
+CODEBLOCKS_REGEX = re.compile("```([A-Za-z0-9\\-.]*)\n(.*?)```", re.S)
 
 
 class CodeblockConverter(commands.Converter):
@@ -28,6 +29,19 @@ class CodeblockConverter(commands.Converter):
         return Codeblock(match.group(1), match.group(2))
 
 
+class CodeblocksConverter(commands.Converter):
+    """
+    A converter that finds all codeblocks in an argument.
+
+    Returns a list of Codeblock namedtuples.
+    An argument without codeblock markdown is treated as a single codeblock.
+    """
+
+    async def convert(self, ctx, argument):
+        codeblocks = [Codeblock(language or None, content) for language, content in CODEBLOCKS_REGEX.findall(argument)]
+        return codeblocks or [await CodeblockConverter().convert(ctx, argument)]
+
+
 class Guild(commands.IDConverter):
     """
     A converter that matches guilds.
@@ -62,3 +76,20 @@ class MessageConverter(commands.IDConverter):
             raise commands.BadArgument('Couldn\'t find a message that matches {}'.format(argument))
 
         return (await CodeblockConverter().convert(ctx, result.content)).content
+
+
+def flag(*names):
+    """
+    Returns a converter that matches one of the given command line style flags.
+
+    Meant to be used with typing.Optional so the flag can be omitted.
+    """
+
+    class Flag(commands.Converter):
+        async def convert(self, ctx, argument):
+            if argument.lower() not in names:
+                raise commands.BadArgument(f'{argument} is not one of {", ".join(names)}')
+
+            return True
+
+    return Flag
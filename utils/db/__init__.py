@@ -3,3 +3,4 @@
 from .db import *
 from .misc import *
 from .format import *
+from .cache import *
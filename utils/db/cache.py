@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import collections
+import re
+import time
+
+from .db import all_tables
+
+__all__ = ['CacheStats', 'CachedConnection', 'QueryCache']
+
+CacheStats = collections.namedtuple('CacheStats', 'hits misses evictions invalidations size')
+
+_IDENTIFIER = r'(?:"(?:[^"]|"")+"|[A-Za-z_][\w$]*)'
+_TABLE_REGEX = re.compile(
+    rf'\b(?:FROM|JOIN|INTO|UPDATE|TABLE)\s+(?:ONLY\s+)?((?:{_IDENTIFIER}\s*\.\s*)*{_IDENTIFIER})', re.IGNORECASE
+)
+_PART_REGEX = re.compile(_IDENTIFIER)
+_WRITE_STATEMENTS = ('insert', 'update', 'delete', 'truncate', 'copy', 'alter', 'drop')
+
+
+def _registered_tables():
+    return {table.__tablename__ for table in all_tables()}
+
+
+def _table_name(name):
+    # public.blacklist and "blacklist" both refer to the blacklist table
+    name = _PART_REGEX.findall(name)[-1]
+    if name.startswith('"'):
+        return name[1:-1].replace('""', '"')
+
+    return name.lower()  # unquoted names are case insensitive
+
+
+def _freeze(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+
+    hash(value)  # raises TypeError for anything else that can't be used as a key
+    return value
+
+
+def _cache_key(method, query, args):
+    try:
+        return method, query, _freeze(args)
+    except TypeError:  # the arguments can't be hashed
+        return None
+
+
+class _Entry:
+    __slots__ = ('value', 'expires', 'tags')
+
+    def __init__(self, value, expires, tags):
+        self.value = value
+        self.expires = expires
+        self.tags = tags
+
+
+class QueryCache:
+    """An LRU cache with TTL for query results that is invalidated by table tags.
+
+    Results are keyed on the method, the statement and its arguments. Each entry is tagged
+    with the registered tables the statement reads from, and any write to one of these tables
+    that goes through this cache drops all entries tagged with it.
+    """
+
+    def __init__(self, *, max_size=1024, ttl=60.0, timefunc=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.time_function = timefunc
+
+        self._entries = collections.OrderedDict()
+        self._tags = collections.defaultdict(set)
+        self._pending = {}
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def stats(self):
+        """Returns the hit and miss statistics of this cache."""
+
+        return CacheStats(self._hits, self._misses, self._evictions, self._invalidations, len(self._entries))
+
+    @staticmethod
+    def tags_for(query):
+        """Returns the names of all registered tables a query refers to."""
+
+        return frozenset(map(_table_name, _TABLE_REGEX.findall(query))) & _registered_tables()
+
+    @staticmethod
+    def is_write(query):
+        """Indicates whether a query modifies data."""
+
+        return query.lstrip().lower().startswith(_WRITE_STATEMENTS)
+
+    def bind(self, con):
+        """Returns a wrapper around a connection or pool that reads through this cache."""
+
+        return CachedConnection(self, con)
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+
+        for tag in entry.tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def _get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        if entry.expires <= self.time_function():
+            self._drop(key)
+            return None
+
+        self._entries.move_to_end(key)
+        return entry
+
+    def _put(self, key, value, ttl, tags):
+        self._drop(key)
+        self._entries[key] = _Entry(value, self.time_function() + ttl, tags)
+
+        for tag in tags:
+            self._tags[tag].add(key)
+
+        while len(self._entries) > self.max_size:
+            self._drop(next(iter(self._entries)))
+            self._evictions += 1
+
+    def invalidate(self, *tags):
+        """Drops all entries that are tagged with one of the given tables."""
+
+        for tag in tags:
+            for key in tuple(self._tags.get(tag, ())):
+                self._drop(key)
+                self._invalidations += 1
+
+    def clear(self):
+        """Drops all entries."""
+
+        self._entries.clear()
+        self._tags.clear()
+        # queries that are still running must not put their results back
+        self._pending.clear()
+
+    async def _read(self, con, method, query, args, *, ttl=None, tags=None, cache=True):
+        if self.is_write(query):
+            # INSERT ... RETURNING and friends
+            return await self._write(con, method, query, args, tags=tags)
+
+        func = getattr(con, method)
+        key = _cache_key(method, query, args) if cache else None
+        if key is None:
+            return await func(query, *args)
+
+        while True:
+            entry = self._get(key)
+            if entry is not None:
+                self._hits += 1
+                return entry.value
+
+            # identical queries that are already running share their result
+            pending = self._pending.get(key)
+            if pending is None:
+                break
+
+            try:
+                result = await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+
+                # the query was cancelled along with the task that ran it, so it has to run again
+                continue
+
+            self._hits += 1
+            return result
+
+        self._misses += 1
+        return await self._fetch(key, func, query, args, ttl=ttl, tags=tags)
+
+    async def _fetch(self, key, func, query, args, *, ttl=None, tags=None):
+        method = key[0]
+        future = self._pending[key] = asyncio.get_event_loop().create_future()
+        try:
+            result = await func(query, *args)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # nobody might be waiting for it
+            raise
+        else:
+            if method == 'fetch':
+                result = tuple(result)
+
+            # a write might have happened while we were waiting for the result
+            if self._pending.get(key) is future:
+                self._put(key, result, self.ttl if ttl is None else ttl, self.tags_for(query) if tags is None else frozenset(tags))
+            future.set_result(result)
+        finally:
+            if self._pending.get(key) is future:
+                del self._pending[key]
+
+        return result
+
+    async def _write(self, con, method, query, args, *, tags=None):
+        try:
+            return await getattr(con, method)(query, *args)
+        finally:
+            if tags is not None:
+                tags = frozenset(tags)
+            elif self.is_write(query):
+                # a write to tables we can't tell apart might affect anything that's cached
+                tags = self.tags_for(query) or None
+            else:
+                tags = frozenset()
+
+            if tags is None:
+                self._invalidations += len(self._entries)
+                self.clear()
+            elif tags:
+                self.invalidate(*tags)
+                for key in [key for key in self._pending if self.tags_for(key[1]) & tags]:
+                    del self._pending[key]
+
+
+class CachedConnection:
+    """Wraps a connection or pool so that reads go through a :class:`QueryCache`.
+
+    Reads accept ``ttl``, ``tags`` and ``cache`` keyword arguments to customize or
+    bypass caching per query, writes accept ``tags`` to override the tables to invalidate.
+    """
+
+    __slots__ = ('cache', 'con')
+
+    def __init__(self, cache, con):
+        self.cache = cache
+        self.con = con
+
+    def __getattr__(self, item):
+        return getattr(self.con, item)
+
+    async def fetch(self, query, *args, **kwargs):
+        return list(await self.cache._read(self.con, 'fetch', query, args, **kwargs))
+
+    async def fetchrow(self, query, *args, **kwargs):
+        return await self.cache._read(self.con, 'fetchrow', query, args, **kwargs)
+
+    async def fetchval(self, query, *args, **kwargs):
+        return await self.cache._read(self.con, 'fetchval', query, args, **kwargs)
+
+    async def execute(self, query, *args, **kwargs):
+        return await self.cache._write(self.con, 'execute', query, args, **kwargs)
+
+    async def executemany(self, query, args, **kwargs):
+        return await self.cache._write(self.con, 'executemany', query, (args,), **kwargs)
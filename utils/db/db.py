@@ -239,10 +239,45 @@ class Column:
         return ' '.join(builder)
 
 
+_INDEX_METHODS = ('btree', 'hash', 'gist', 'spgist', 'gin', 'brin')
+
+
+def _index_element(column):
+    if isinstance(column, Column):
+        return column.name
+
+    # anything that isn't a column name, optionally followed by an operator class or ordering,
+    # is an expression and needs its own parentheses
+    if column.startswith('(') or all(part.isidentifier() for part in column.split()):
+        return column
+    return f'({column})'
+
+
 class Index:
-    def __init__(self, *columns, unique=False):
+    """Represents an index on a table.
+
+    Columns can either be :class:`Column` objects or strings, which may also be
+    expressions like ``lower(name)``. Note that ``include`` requires PostgreSQL 11.
+    """
+
+    def __init__(self, *columns, unique=False, using=None, where=None, include=(), concurrently=False):
+        if not columns:
+            raise SchemaError('An index needs at least one column or expression.')
+
+        if using is not None:
+            using = using.lower()
+            if using not in _INDEX_METHODS:
+                raise SchemaError(f'using must be one of {_INDEX_METHODS}.')
+
+        if unique and using not in (None, 'btree'):
+            raise SchemaError('Only B-tree indexes can be unique.')
+
         self.columns = columns
         self.unique = unique
+        self.using = using
+        self.where = where
+        self.include = include
+        self.concurrently = concurrently
         self.name = None
         self.table = None
 
@@ -252,19 +287,26 @@ class Index:
 
     def create_sql(self):
         builder = ['CREATE']
+        build = builder.append
 
         if self.unique:
-            builder.append('UNIQUE')
+            build('UNIQUE')
+        build('INDEX')
+        if self.concurrently:
+            build('CONCURRENTLY')
 
-        builder.extend([
-            'INDEX IF NOT EXISTS',
-            self.name,
-            'ON',
-            self.table.__tablename__,
-            f'({", ".join(column.name if isinstance(column, Column) else column for column in self.columns)});'
-        ])
+        builder.extend(['IF NOT EXISTS', self.name, 'ON', self.table.__tablename__])
 
-        return ' '.join(builder)
+        if self.using:
+            build(f'USING {self.using.upper()}')
+        build(f'({", ".join(map(_index_element, self.columns))})')
+
+        if self.include:
+            build(f'INCLUDE ({", ".join(column.name if isinstance(column, Column) else column for column in self.include)})')
+        if self.where:
+            build(f'WHERE {self.where}')
+
+        return ' '.join(builder) + ';'
 
 
 class Table:
@@ -293,9 +335,18 @@ class Table:
         build(f'(\n{column_statements}\n);')
 
         statements = [' '.join(builder)]
-        statements.extend(index.create_sql() for index in cls.indexes)
+        statements.extend(index.create_sql() for index in cls.indexes if not index.concurrently)
         return "\n".join(statements)
 
+    @classmethod
+    def create_concurrent_sql(cls):
+        """Returns the statements for the indexes that are built concurrently.
+
+        These can't run inside of a transaction block, so they have to be executed one by one.
+        """
+
+        return [index.create_sql() for index in cls.indexes if index.concurrently]
+
 
 def all_tables():
     return Table.__subclasses__()
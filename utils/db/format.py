@@ -1,5 +1,8 @@
 # -*- coding: utf-8 -*-
 
+import heapq
+import json
+
 
 class TableFormat:
     """This class handles all related things to the visual presentation of a table."""
@@ -44,3 +47,95 @@ class TableFormat:
 
         to_draw.append(table)
         return '\n'.join(to_draw)
+
+
+def _total_time(node):
+    # Actual Total Time is the average of a single loop
+    return node.get('Actual Total Time', 0.0) * node.get('Actual Loops', 1)
+
+
+def _walk_plan(node, depth=0):
+    """Walks a plan tree depth-first, yielding each node along with its depth, total and exclusive time across all loops."""
+
+    children = node.get('Plans', [])
+    total = _total_time(node)
+    exclusive = total - sum(_total_time(child) for child in children)
+
+    yield depth, node, total, max(exclusive, 0.0)
+
+    for child in children:
+        yield from _walk_plan(child, depth + 1)
+
+
+class PlanFormat(TableFormat):
+    """Renders the output of ``EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON)`` as a compact plan tree.
+
+    Times are summed up across all loops of a node. Up to ``hot_nodes`` nodes whose exclusive time
+    makes up at least ``hot_share`` of the whole plan's are marked with ``*``, nodes whose
+    actual row count is off from the planner's estimate by more than the given factor
+    are marked with ``!``.
+    """
+
+    def __init__(self, plan, *, hot_nodes=3, hot_share=0.25, misestimate=10):
+        super().__init__()
+
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+
+        self.plan = plan[0]
+        self.hot_nodes = hot_nodes
+        self.hot_share = hot_share
+        self.misestimate = misestimate
+
+        self.set(['', 'Node', 'Self ms', 'Total ms', 'Rows (act/est)', 'Loops', 'Hit', 'Read'])
+        self._add_nodes(list(_walk_plan(self.plan['Plan'])))
+
+    def _is_misestimated(self, node):
+        actual = node.get('Actual Rows', 0)
+        estimated = node.get('Plan Rows', 0)
+
+        return max(actual, estimated) > self.misestimate * max(min(actual, estimated), 1)
+
+    def _add_nodes(self, nodes):
+        threshold = self.hot_share * sum(exclusive for *_, exclusive in nodes)
+        hottest = {
+            id(node) for _, node, _, exclusive in heapq.nlargest(self.hot_nodes, nodes, key=lambda n: n[3])
+            if exclusive > 0 and exclusive >= threshold
+        }
+
+        rows = []
+        for depth, node, total, exclusive in nodes:
+            name = node['Node Type']
+            relation = node.get('Index Name') or node.get('Relation Name')
+            if relation:
+                name = f'{name} on {relation}'
+
+            markers = ('*' if id(node) in hottest else '') + ('!' if self._is_misestimated(node) else '')
+            rows.append([
+                markers,
+                f'{"  " * depth}{"-> " if depth else ""}{name}',
+                f'{exclusive:.2f}',
+                f'{total:.2f}',
+                f'{node.get("Actual Rows", 0)}/{node.get("Plan Rows", 0)}',
+                node.get('Actual Loops', 1),
+                node.get('Shared Hit Blocks', 0),
+                node.get('Shared Read Blocks', 0),
+            ])
+
+        # Cells are centered, so the tree column is padded to keep the indentation intact.
+        width = max(len(row[1]) for row in rows)
+        for row in rows:
+            row[1] = row[1].ljust(width)
+
+        self.add(rows)
+
+    def summary(self):
+        """Returns a short summary of the plan's timings and buffer usage."""
+
+        root = self.plan['Plan']
+        return (
+            f'Planning: {self.plan.get("Planning Time", 0.0):.2f}ms, '
+            f'Execution: {self.plan.get("Execution Time", 0.0):.2f}ms, '
+            f'Buffers: {root.get("Shared Hit Blocks", 0)} hit / {root.get("Shared Read Blocks", 0)} read\n'
+            f'* = at least {self.hot_share:.0%} of the self time, ! = rows off by more than {self.misestimate}x'
+        )
@@ -3,6 +3,7 @@
 import asyncio
 import json
 import time
+import typing
 
 import asyncpg
 from discord.ext import commands
@@ -47,7 +48,8 @@ async def create_pool(config):
 class PostgreSQLExecutor:
     """Executes SQL queries for PostgreSQL inside of an async function or generator."""
 
-    def __init__(self, ctx: commands.Context, query: str, *, loop: asyncio.BaseEventLoop = None):
+    def __init__(self, ctx: commands.Context, query: str, *, explain: bool = False, running: typing.Set[str] = None,
+                 loop: asyncio.BaseEventLoop = None):
         self.queries = []
 
         if query.count(';') > 1:
@@ -57,6 +59,8 @@ class PostgreSQLExecutor:
             self.queries.append(query.strip())
 
         self.ctx = ctx
+        self.explain = explain
+        self.running = running
         self.loop = loop or asyncio.get_event_loop()
 
     def __aiter__(self):
@@ -67,6 +71,10 @@ class PostgreSQLExecutor:
             raise StopAsyncIteration
 
         query = self.queries.pop(0)
+        if self.explain:
+            # note that ANALYZE actually runs the statement
+            return self.execute(self.ctx.db.fetchval, f'EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {query}')
+
         # determine the way of how we execute the query
         if query.lower().startswith('select'):
             func = self.ctx.db.fetch
@@ -78,8 +86,15 @@ class PostgreSQLExecutor:
     async def execute(self, func, query):
         """Executes SQL queries and returns their result."""
 
-        start = time.perf_counter()
-        result = await func(query)
-        total = (time.perf_counter() - start) * 1000.0
+        if self.running is not None:
+            self.running.add(query)
+
+        try:
+            start = time.perf_counter()
+            result = await func(query)
+            total = (time.perf_counter() - start) * 1000.0
+        finally:
+            if self.running is not None:
+                self.running.discard(query)
 
         return total, result
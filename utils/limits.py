@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+
+"""
+Worker processes that run untrusted or expensive code, and their resource limits.
+
+The limits only work on Unix and do nothing elsewhere.
+"""
+
+import contextlib
+import multiprocessing
+import signal
+from concurrent.futures import ProcessPoolExecutor
+
+import psutil
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+class CPUTimeExceeded(Exception):
+    """Raised inside a :func:`cpu_time_limit` block once it used up its CPU time."""
+
+
+_limited = False
+
+
+def _cpu_time_exceeded(signum, frame):
+    # the soft limit might be hit right after a block finished
+    if _limited:
+        raise CPUTimeExceeded()
+
+
+def limit_memory(limit: int):
+    """Limits the memory the current process may allocate in addition to what it already uses."""
+
+    if resource is None:
+        return
+
+    limit += psutil.Process().memory_info().vms
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def worker_context():
+    """Returns the multiprocessing context to start worker processes with.
+
+    Unlike forked ones, forkserver and spawned workers don't share the memory, event loop
+    or connections of the bot. They still import the main module though, so every worker
+    imports launch.py, which loads the config and the bot's modules. Forkserver starts
+    workers faster, spawn is used where it isn't available.
+    """
+
+    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    return multiprocessing.get_context(method)
+
+
+def init_worker(memory_limit: int):
+    """Prepares the current process to be a worker with limited memory."""
+
+    # the bot takes care of shutting the workers down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    limit_memory(memory_limit)
+
+
+def _init_pool_worker(memory_limit, initializer, initargs):
+    init_worker(memory_limit)
+    if initializer is not None:
+        initializer(*initargs)
+
+
+def make_worker_pool(workers: int, *, memory_limit: int, initializer=None, initargs=()):
+    """Returns a process pool whose workers are prepared with :func:`init_worker`, then ``initializer``."""
+
+    return ProcessPoolExecutor(
+        workers,
+        mp_context=worker_context(),
+        initializer=_init_pool_worker,
+        initargs=(memory_limit, initializer, initargs)
+    )
+
+
+@contextlib.contextmanager
+def cpu_time_limit(seconds: int):
+    """Raises :exc:`CPUTimeExceeded` if the block uses more than the given CPU time.
+
+    The limit is enforced with the soft RLIMIT_CPU, so the process is only
+    interrupted at the granularity of whole seconds.
+    """
+
+    global _limited
+
+    if resource is None:
+        yield
+        return
+
+    signal.signal(signal.SIGXCPU, _cpu_time_exceeded)
+
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    resource.setrlimit(resource.RLIMIT_CPU, (int(usage.ru_utime + usage.ru_stime + seconds) + 1, hard))
+
+    _limited = True
+    try:
+        yield
+    finally:
+        _limited = False
+        resource.setrlimit(resource.RLIMIT_CPU, (hard, hard))
@@ -3,6 +3,7 @@
 import asyncio
 import collections
 import contextlib
+import logging
 import re
 
 import discord
@@ -10,6 +11,7 @@ from discord.ext import commands
 
 from .highlightjs import get_language
 
+logger = logging.getLogger(__name__)
 
 EmojiSettings = collections.namedtuple('EmojiSettings', 'start back forward end close')
 
@@ -199,6 +201,75 @@ class PaginatorEmbedInterface(PaginatorInterface):
         return self.paginator.max_size
 
 
+class KeysetPaginatorInterface(PaginatorEmbedInterface):
+    """A paginator interface that fetches its pages only when they are displayed.
+
+    ``fetch_page`` is a coroutine function taking the index of a page and the key
+    of the last entry on the previous one (None for the first page). It returns the lines
+    of the page along with the key of its last entry, or None if it's the last page.
+    """
+
+    def __init__(self, bot: commands.Bot, fetch_page, **kwargs):
+        super().__init__(bot, commands.Paginator(prefix='', suffix=''), **kwargs)
+
+        self.fetch_page = fetch_page
+        self._keys = [None]  # the keys to start each known page after
+        self._content = ''
+        self._content_page = 0
+        self._exhausted = False
+        # held while a page is fetched and displayed, so concurrent updates can't mix up pages
+        self._page_lock = asyncio.Lock()
+
+    @property
+    def pages(self):
+        return [self._content] * len(self._keys)
+
+    @property
+    def send_kwargs(self):
+        # the displayed page might have changed while the content was being fetched
+        self._embed.description = self._content
+        self._embed.set_footer(text=f'Page {self._content_page + 1}/{self.page_count}{"" if self._exhausted else "+"}')
+        return {'embed': self._embed}
+
+    async def load_page(self, index):
+        lines, last_key = await self.fetch_page(index, self._keys[index])
+        self._content = '\n'.join(lines)
+        self._content_page = index
+
+        if index + 1 == len(self._keys) and not self._exhausted:
+            if last_key is None:
+                self._exhausted = True
+            else:
+                self._keys.append(last_key)
+
+    async def send_to(self, destination: discord.abc.Messageable):
+        async with self._page_lock:
+            await self.load_page(0)
+            await super().send_to(destination)
+
+    async def update(self):
+        if self.update_lock.locked():
+            return
+
+        async with self.update_lock:
+            if self.update_lock.locked():
+                # if this has exhausted the semaphore, we need to calm down
+                await asyncio.sleep(1)
+
+            async with self._page_lock:
+                try:
+                    await self.load_page(self.display_page)
+                except Exception:
+                    logger.exception('Failed to fetch page %d of a paginator.', self.display_page + 1)
+                    return
+
+                if not self.sent_page_reactions and self.page_count > 1:
+                    self.bot.loop.create_task(self.send_all_reactions())
+                    self.sent_page_reactions = True
+
+                await self.message.edit(**self.send_kwargs)
+
+
 class WrappedPaginator(commands.Paginator):
     """A paginator that allows automatic correcting of lines that do not fit.
 
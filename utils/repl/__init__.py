@@ -4,7 +4,12 @@ from discord.ext import commands
 
 from .compilation import *
 from .inspections import all_inspections
+from .isolation import IsolatedExecutionError, IsolatedExecutor, RemoteObject
+from .memory import *
+from .output import *
+from .profiling import *
 from .scope import *
+from .timing import *
 
 
 def get_var_dict_from_ctx(ctx: commands.Context):
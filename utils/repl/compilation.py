@@ -2,6 +2,10 @@
 
 import ast
 import asyncio
+import collections
+import copy
+import functools
+import hashlib
 import inspect
 import sys
 import textwrap
@@ -10,17 +14,20 @@ import import_expression
 
 from .scope import Scope
 
-CORO_CODE = """
-async def _repl_coroutine({{0}}):
-    import asyncio
-    from importlib import import_module as {0}
+# the names that are available to REPL code without importing them
+REPL_IMPORTS = """
+import asyncio
+from importlib import import_module as {0}
 
-    import aiohttp
-    import discord
-    from discord.ext import commands
+import aiohttp
+import discord
+from discord.ext import commands
 
-    import utils
+import utils
+""".format(import_expression.constants.IMPORTER)
 
+CORO_CODE = """
+async def _repl_coroutine({{0}}):{0}
     try:
         pass
 {{1}}
@@ -28,7 +35,16 @@ async def _repl_coroutine({{0}}):
         _async_executor = utils.repl.get_parent_var('async_executor', skip_frames=1)
         if _async_executor:
             _async_executor.scope.globals.update(locals())
-""".format(import_expression.constants.IMPORTER)
+""".format(textwrap.indent(REPL_IMPORTS, '    '))
+
+# how many compiled snippets AsyncCodeExecutor keeps around
+MAX_CACHED_CODE = 128
+_compiled_code = collections.OrderedDict()
+
+
+@functools.lru_cache(maxsize=16)
+def _coro_template(args: str) -> ast.Module:
+    return import_expression.parse(CORO_CODE.format(args, ''), mode='exec')
 
 
 def wrap_code(code: str, args: str = '') -> ast.Module:
@@ -40,11 +56,10 @@ def wrap_code(code: str, args: str = '') -> ast.Module:
 
     if sys.version_info >= (3, 7):
         user_code = import_expression.parse(code, mode='exec')
-        injected = ''
+        # the template is only parsed once per argument list, wrapping modifies a copy of it
+        mod = copy.deepcopy(_coro_template(args))
     else:
-        injected = code
-
-    mod = import_expression.parse(CORO_CODE.format(args, textwrap.indent(injected, ' ' * 8)), mode='exec')
+        mod = import_expression.parse(CORO_CODE.format(args, textwrap.indent(code, ' ' * 8)), mode='exec')
 
     definition = mod.body[-1]  # async def ...:
     assert isinstance(definition, ast.AsyncFunctionDef)
@@ -92,8 +107,26 @@ def wrap_code(code: str, args: str = '') -> ast.Module:
     return mod
 
 
+def _compile(code: str, arg_names: tuple):
+    key = hashlib.blake2b(code.encode('utf-8'), digest_size=16).digest(), arg_names
+    try:
+        compiled = _compiled_code[key]
+    except KeyError:
+        compiled = _compiled_code[key] = compile(wrap_code(code, args=', '.join(arg_names)), '<repl>', 'exec')
+        if len(_compiled_code) > MAX_CACHED_CODE:
+            _compiled_code.popitem(last=False)
+    else:
+        _compiled_code.move_to_end(key)
+
+    return compiled
+
+
 class AsyncCodeExecutor:
-    """Executes/evaluates Python code inside of an async function or generator."""
+    """Executes/evaluates Python code inside of an async function or generator.
+
+    The compiled code of recently executed snippets is cached, so running
+    the same code again skips parsing and compiling it.
+    """
 
     __slots__ = ('args', 'arg_names', 'code', 'loop', 'scope')
 
@@ -106,12 +139,12 @@ class AsyncCodeExecutor:
                 self.arg_names.append(key)
                 self.args.append(value)
 
-        self.code = wrap_code(code, args=', '.join(self.arg_names))
+        self.code = _compile(code, tuple(self.arg_names))
         self.scope = scope or Scope()
         self.loop = loop or asyncio.get_event_loop()
 
     def __aiter__(self):
-        exec(compile(self.code, '<repl>', 'exec'), self.scope.globals, self.scope.locals)
+        exec(self.code, self.scope.globals, self.scope.locals)
         func_def = self.scope.locals.get('_repl_coroutine') or self.scope.globals['_repl_coroutine']
 
         return self.traverse(func_def)
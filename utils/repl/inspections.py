@@ -1,37 +1,100 @@
+import asyncio
 import collections
+import concurrent.futures
 import functools
 import inspect
+import itertools
 import os
+import random
+import weakref
+
+import humanize
+
+from .memory import deep_sizeof
 
 INSPECTIONS = []
 
+# how long a single inspection may take, in seconds
+INSPECTION_TIMEOUT = 0.5
+SLOW_INSPECTION_TIMEOUT = 2.0
+# how many elements of a container an inspection may look at before it samples them
+MAX_ELEMENTS = 10000
+# how many objects the deep size inspection may visit
+MAX_DEEP_SIZE_OBJECTS = 100000
+
+# inspections that time out keep running, so they get their own threads instead of the loop's default executor
+_executor = concurrent.futures.ThreadPoolExecutor(max_workers=4, thread_name_prefix='inspection')
+
+
+def add_inspection(name, *, slow=False, memo=None):
+    """A decorator that adds an object inspection.
 
-def add_inspection(name):
-    """A decorator that adds an object inspection."""
+    Slow inspections, e.g. those that hit the filesystem, get more time before they're reported as timed out.
+    If ``memo`` is given, it's called with the inspected object to get a key, usually its type,
+    under which the result is cached for as long as the key is alive. Keys are compared by identity,
+    and the results for keys that can't be weakly referenced aren't cached.
+    """
 
     def decorator(func):
+        cache = {}
+
         @functools.wraps(func)
-        def wrapper(*args, **kwargs):
+        def wrapper(obj):
             try:
-                return func(*args, **kwargs)
+                if memo is None:
+                    return func(obj)
+
+                key = memo(obj)
+                try:
+                    return cache[id(key)]
+                except KeyError:
+                    pass
+
+                result = func(obj)
+                try:
+                    # the entry is gone before the id can be reused by another object
+                    weakref.finalize(key, cache.pop, id(key), None)
+                except TypeError:  # the key can't be weakly referenced
+                    return result
+
+                cache[id(key)] = result
+                return result
             except (TypeError, AttributeError, ValueError, OSError):
                 return
 
-        INSPECTIONS.append((name, wrapper))
+        INSPECTIONS.append((name, wrapper, SLOW_INSPECTION_TIMEOUT if slow else INSPECTION_TIMEOUT))
         return func
 
     return decorator
 
 
-def all_inspections(obj):
-    """Generator to iterate all current object inspections."""
+async def all_inspections(obj, *, loop=None):
+    """Async generator to iterate all current object inspections.
+
+    The inspections run concurrently in threads. Those that haven't finished within their
+    timeout are reported as timed out, and those that raised are reported with their error.
+    """
+
+    loop = loop or asyncio.get_event_loop()
+    start = loop.time()
+    pending = [(name, loop.run_in_executor(_executor, callback, obj), timeout) for name, callback, timeout in INSPECTIONS]
+
+    for name, future, timeout in pending:
+        try:
+            result = await asyncio.wait_for(future, max(start + timeout - loop.time(), 0))
+        except asyncio.TimeoutError:
+            result = '<timed out>'
+        except Exception as e:
+            result = f'<failed: {type(e).__name__}: {str(e)[:100]}>'
 
-    for name, callback in INSPECTIONS:
-        result = callback(obj)
         if result:
             yield name, result
 
 
+def _class_or_type(obj):
+    return obj if isinstance(obj, type) else type(obj)
+
+
 def class_name(obj):
     """Get the name of an object, including the module name if available."""
 
@@ -59,7 +122,7 @@ def len_inspection(obj):
     return len(obj)
 
 
-@add_inspection('MRO')
+@add_inspection('MRO', memo=lambda obj: obj)
 def mro_inspection(obj):
     if not inspect.isclass(obj):
         return
@@ -67,7 +130,7 @@ def mro_inspection(obj):
     return ', '.join(class_name(x) for x in inspect.getmro(obj))
 
 
-@add_inspection('Type MRO')
+@add_inspection('Type MRO', memo=type)
 def type_mro_inspection(obj):
     obj_type = type(obj)
     if obj_type in (type, object):
@@ -93,12 +156,12 @@ def subclass_inspection(obj):
     return output
 
 
-@add_inspection('Module Name')
+@add_inspection('Module Name', slow=True)
 def module_inspection(obj):
     return inspect.getmodule(obj).__name__
 
 
-@add_inspection('File Location')
+@add_inspection('File Location', slow=True)
 def file_location_inspection(obj):
     file_location = inspect.getfile(obj)
     cwd = os.getcwd()
@@ -108,14 +171,35 @@ def file_location_inspection(obj):
     return file_location
 
 
-@add_inspection('Line Span')
+@add_inspection('Line Span', slow=True)
 def line_span_inspection(obj):
     source_lines, source_offset = inspect.getsourcelines(obj)
     return f'{source_offset}-{source_offset + len(source_lines)}'
 
 
-@add_inspection('Signature')
+@add_inspection('Deep Size', slow=True)
+def deep_size_inspection(obj):
+    try:
+        usage = deep_sizeof(obj, max_objects=MAX_DEEP_SIZE_OBJECTS, top=1)
+    except Exception as e:
+        return f'<failed: {type(e).__name__}>'
+
+    output = f'{humanize.naturalsize(usage.size, binary=True)} in {usage.objects:,} objects'
+    if not usage.complete:
+        output = f'at least {output}'
+    if usage.children:
+        label, size = usage.children[0]
+        output += f', largest {label} ({humanize.naturalsize(size, binary=True)})'
+
+    return output
+
+
+@add_inspection('Signature', memo=lambda obj: obj)
 def sig_inspection(obj):
+    # the error inspect raises for other objects contains their repr, which can be huge
+    if not callable(obj):
+        return
+
     return inspect.signature(obj)
 
 
@@ -125,11 +209,21 @@ def content_type_inspection(obj):
         return
 
     total = len(obj)
-    types = collections.Counter(type(x) for x in obj)
+    if total <= MAX_ELEMENTS:
+        sample = obj
+    elif isinstance(obj, set):
+        sample = itertools.islice(obj, MAX_ELEMENTS)
+    else:
+        sample = (obj[index] for index in random.sample(range(total), MAX_ELEMENTS))
+
+    types = collections.Counter(type(x) for x in sample)
+    counted = min(total, MAX_ELEMENTS)
 
-    output = ', '.join(f'{x.__name__} ({y*100/total:.1f}\uFF05)' for x, y in types.most_common(3))
+    output = ', '.join(f'{x.__name__} ({y*100/counted:.1f}\uFF05)' for x, y in types.most_common(3))
     if len(types) > 3:
         output += ', ...'
+    if total > MAX_ELEMENTS:
+        output += f' (sampled {counted} of {total})'
 
     return output
 
@@ -157,9 +251,10 @@ POSSIBLE_OPS = {
 }
 
 
-@add_inspection('Operations')
+@add_inspection('Operations', memo=_class_or_type)
 def compat_operation_inspection(obj):
-    obj_dict = dir(obj)
+    # operators are looked up on the type, so the result is the same for all of its instances
+    obj_dict = dir(_class_or_type(obj))
     operations = []
 
     for operation, member in POSSIBLE_OPS.items():
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+
+"""
+Execution of REPL code in worker processes, isolated from the bot.
+
+CPU-bound code that runs in the bot's event loop blocks the heartbeats of every shard.
+Code executed through :class:`IsolatedExecutor` runs in a warm worker process instead,
+limited in CPU time and memory, and gets killed if it takes too long.
+"""
+
+import asyncio
+import pickle
+import traceback
+
+from .compilation import AsyncCodeExecutor
+from .scope import Scope
+from .. import limits
+
+# values made of these types are sent back as they are, anything else as its repr
+_PRIMITIVES = (type(None), bool, int, float, complex, str, bytes)
+_CONTAINERS = (list, tuple, set, frozenset)
+_MAX_PICKLE_SIZE = 1024 * 1024
+
+
+class RemoteObject:
+    """The representation of an object that only existed in a worker process."""
+
+    __slots__ = ('representation',)
+
+    def __init__(self, representation: str):
+        self.representation = representation
+
+    def __repr__(self):
+        return self.representation
+
+
+class IsolatedExecutionError(Exception):
+    """Raised when isolated code raised an exception, with its formatted traceback as message."""
+
+
+def _is_primitive(value, depth=0):
+    if isinstance(value, _PRIMITIVES):
+        return True
+    if depth > 8:
+        return False
+    if isinstance(value, _CONTAINERS):
+        return all(_is_primitive(item, depth + 1) for item in value)
+    if isinstance(value, dict):
+        return all(_is_primitive(key, depth + 1) and _is_primitive(item, depth + 1) for key, item in value.items())
+
+    return False
+
+
+def _serialize(value):
+    if type(value) in _PRIMITIVES or _is_primitive(value):
+        data = pickle.dumps(value)
+        if len(data) <= _MAX_PICKLE_SIZE:
+            return value
+
+    return RemoteObject(repr(value))
+
+
+async def _execute(code: str):
+    return [_serialize(result) async for result in AsyncCodeExecutor(code, Scope())]
+
+
+def _worker(connection, memory_limit: int):
+    limits.init_worker(memory_limit)
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    while True:
+        try:
+            code, cpu_limit = connection.recv()
+        except EOFError:
+            return
+
+        try:
+            with limits.cpu_time_limit(cpu_limit):
+                reply = ('result', loop.run_until_complete(_execute(code)))
+        except limits.CPUTimeExceeded:
+            reply = ('timeout', None)
+        except SyntaxError as e:
+            reply = ('syntax', e)
+        except Exception as e:
+            reply = ('error', ''.join(traceback.format_exception(type(e), e, e.__traceback__)))
+
+        connection.send(reply)
+
+
+class _Worker:
+    __slots__ = ('process', 'connection')
+
+    def __init__(self, context, memory_limit):
+        self.connection, child = context.Pipe()
+        self.process = context.Process(target=_worker, args=(child, memory_limit), daemon=True)
+        self.process.start()
+        child.close()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.connection.close()
+
+
+class IsolatedExecutor:
+    """A warm pool of worker processes that execute REPL code.
+
+    Each execution may use ``cpu_limit`` seconds of CPU time and take ``timeout`` seconds in total,
+    each worker may use ``memory_limit`` bytes of memory. Workers that exceed the timeout are killed
+    and replaced. The code has no access to the bot, and results are sent back as they are if they
+    are made of primitive types, or as :class:`RemoteObject` with their repr otherwise.
+    """
+
+    def __init__(self, *, loop=None, workers=2, timeout=60, cpu_limit=30, memory_limit=1024 * 1024 * 1024):
+        self.loop = loop or asyncio.get_event_loop()
+        self.workers = workers
+        self.timeout = timeout
+        self.cpu_limit = cpu_limit
+        self.memory_limit = memory_limit
+
+        self._context = limits.worker_context()
+        self._idle = None
+        self._all = set()
+
+    def _spawn(self):
+        worker = _Worker(self._context, self.memory_limit)
+        self._all.add(worker)
+        return worker
+
+    def start(self):
+        """Starts the worker processes if they aren't running yet."""
+
+        if self._idle is None:
+            self._idle = asyncio.Queue()
+            for _ in range(self.workers):
+                self._idle.put_nowait(self._spawn())
+
+    def close(self):
+        for worker in self._all:
+            worker.kill()
+
+        self._all.clear()
+        self._idle = None
+
+    async def _replace(self, worker):
+        self._all.discard(worker)
+        await self.loop.run_in_executor(None, worker.kill)
+
+        return self._spawn()
+
+    async def _run(self, code: str):
+        self.start()
+        worker = await self._idle.get()
+
+        try:
+            if not worker.process.is_alive():
+                worker = await self._replace(worker)
+
+            worker.connection.send((code, self.cpu_limit))
+            future = self.loop.run_in_executor(None, worker.connection.recv)
+            kind, value = await asyncio.wait_for(future, self.timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError, EOFError, OSError):
+            # the worker is either stuck or dead, in both cases it has to go
+            worker = await self._replace(worker)
+            raise
+        finally:
+            if self._idle is not None:
+                self._idle.put_nowait(worker)
+
+        if kind == 'timeout':
+            raise asyncio.TimeoutError()
+        elif kind == 'syntax':
+            raise value
+        elif kind == 'error':
+            raise IsolatedExecutionError(value)
+
+        return value
+
+    async def execute(self, code: str):
+        """Executes code in a worker process, yielding each of its results."""
+
+        for result in await self._run(code):
+            yield result
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+
+"""
+Deep memory size calculation of objects.
+"""
+
+import collections
+import sys
+import types
+
+__all__ = ['MemoryUsage', 'deep_sizeof']
+
+MemoryUsage = collections.namedtuple('MemoryUsage', 'size objects complete children')
+
+# objects that are shared by the whole program rather than owned by anything that refers to them
+_SHARED_TYPES = (
+    type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType,
+    types.CodeType, types.FrameType,
+)
+_CONTAINERS = (list, tuple, set, frozenset, collections.deque)
+
+
+def _slots(cls):
+    for klass in cls.__mro__:
+        slots = klass.__dict__.get('__slots__', ())
+        if isinstance(slots, str):
+            slots = (slots,)
+
+        for name in slots:
+            if name not in ('__dict__', '__weakref__'):
+                yield name
+
+
+def _key_label(key):
+    try:
+        label = repr(key)
+    except Exception:
+        label = f'<{type(key).__name__}>'
+
+    return f'[{label if len(label) <= 80 else label[:77] + "..."}]'
+
+
+def _iter_referents(obj, labelled):
+    # the copies are made in C without releasing the GIL, so they're safe while other threads mutate the containers
+    if isinstance(obj, dict):
+        for key, value in list(obj.items()):
+            yield None, key
+            yield _key_label(key) if labelled else '', value
+        return
+
+    if isinstance(obj, _CONTAINERS):
+        yield from ((f'[{index}]' if labelled else '', item) for index, item in enumerate(tuple(obj)))
+        return
+
+    attributes = getattr(obj, '__dict__', None)
+    if isinstance(attributes, dict):
+        yield '__dict__', attributes
+
+    for name in _slots(type(obj)):
+        try:
+            yield f'.{name}', object.__getattribute__(obj, name)
+        except AttributeError:
+            pass
+
+
+def _referents(obj, *, labelled=False):
+    """Returns the labels and objects an object owns.
+
+    Labels are only built if ``labelled`` is True. Objects that fail to be inspected, e.g. dead
+    weakref proxies or objects with broken properties, are treated as if they owned nothing.
+    """
+
+    try:
+        return list(_iter_referents(obj, labelled))
+    except Exception:
+        return []
+
+
+def _sizeof(obj):
+    try:
+        return sys.getsizeof(obj)
+    except Exception:  # a broken __sizeof__
+        return 0
+
+
+def _children(obj):
+    """Like :func:`_referents`, but yields the attributes in an instance dict after the dict itself."""
+
+    for label, child in _referents(obj, labelled=True):
+        yield label, child
+
+        if label == '__dict__':
+            try:
+                attributes = list(child.items())
+            except Exception:
+                continue
+
+            for name, value in attributes:
+                yield None, name
+                yield f'.{name}' if isinstance(name, str) else _key_label(name), value
+
+
+class _Traversal:
+    """Keeps track of the objects a traversal has visited, so that every object is only counted once."""
+
+    __slots__ = ('seen', 'count', 'max_objects')
+
+    def __init__(self, obj, max_objects):
+        self.seen = {id(obj)}
+        self.count = 1
+        self.max_objects = max_objects
+
+    @property
+    def exhausted(self):
+        return self.count >= self.max_objects
+
+    def visit(self, obj):
+        """Marks an object as visited, returns False if it shouldn't be counted."""
+
+        # isinstance would look up __class__ on the object itself, which fails for dead weakref proxies
+        if id(obj) in self.seen or issubclass(type(obj), _SHARED_TYPES):
+            return False
+
+        self.seen.add(id(obj))
+        self.count += 1
+        return True
+
+    def size(self, root, *, deep=True):
+        """Returns the size of an object and, if ``deep`` is True, of everything it owns that hasn't been visited yet."""
+
+        if not self.visit(root):
+            return 0
+        if not deep:
+            return _sizeof(root)
+
+        size = 0
+        stack = [root]
+        while stack:
+            current = stack.pop()
+            size += _sizeof(current)
+
+            for _, child in _referents(current):
+                if self.exhausted:
+                    return size
+                if self.visit(child):
+                    stack.append(child)
+
+        return size
+
+
+def deep_sizeof(obj, *, max_objects: int = 100000, top: int = 10):
+    """Calculates the memory an object retains, including everything it owns.
+
+    The traversal follows containers, ``__dict__`` and ``__slots__``, visits every object only once
+    and skips shared objects such as modules, classes and functions. An object that is reachable
+    through several children only counts for the first of them. Once ``max_objects`` objects have
+    been visited, the traversal stops and the result is marked as incomplete.
+
+    Returns the total size, the number of visited objects, whether the traversal completed and
+    the ``top`` children that retain the most memory, as (label, size) tuples.
+    """
+
+    traversal = _Traversal(obj, max_objects)
+    total = _sizeof(obj)
+    children = []
+
+    for label, child in _children(obj):
+        if traversal.exhausted:
+            break
+
+        # the attributes are listed as children rather than the instance dict that holds them
+        size = traversal.size(child, deep=label != '__dict__')
+        total += size
+        if label not in (None, '__dict__'):
+            children.append((label, size))
+
+    children.sort(key=lambda item: item[1], reverse=True)
+    return MemoryUsage(total, traversal.count, not traversal.exhausted, children[:top])
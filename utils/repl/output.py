@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+
+"""
+Per-task capturing of stdout and stderr.
+
+contextlib.redirect_stdout swaps the process-wide sys.stdout, so concurrent REPL sessions
+and anything else that prints in the meantime would end up in the same buffer. Instead,
+sys.stdout and sys.stderr are replaced once by proxies that look up the capture of the
+current context in a context variable, which asyncio copies into every task it creates.
+"""
+
+import asyncio
+import contextvars
+import sys
+
+__all__ = ['ContextualStream', 'OutputCapture']
+
+_capture = contextvars.ContextVar('repl_output_capture', default=None)
+
+
+class ContextualStream:
+    """Forwards writes to the capture of the current context, or to the original stream if there is none."""
+
+    __slots__ = ('original',)
+
+    def __init__(self, original):
+        self.original = original
+
+    def __getattr__(self, item):
+        return getattr(self.original, item)
+
+    def write(self, text):
+        capture = _capture.get()
+        # tasks created during a capture keep it in their context after it's exited
+        if capture is None or capture.closed:
+            return self.original.write(text)
+
+        return capture.write(text)
+
+    def flush(self):
+        capture = _capture.get()
+        if capture is None or capture.closed:
+            self.original.flush()
+
+    @classmethod
+    def install(cls):
+        """Replaces sys.stdout and sys.stderr with contextual streams, unless that has already happened."""
+
+        if not isinstance(sys.stdout, cls):
+            sys.stdout = cls(sys.stdout)
+        if not isinstance(sys.stderr, cls):
+            sys.stderr = cls(sys.stderr)
+
+
+class OutputCapture:
+    """Captures stdout and stderr of the current task and the tasks it creates while active.
+
+    Output those tasks write after the capture was exited goes to the original streams.
+    """
+
+    __slots__ = ('_chunks', '_token', '_closed')
+
+    def __init__(self):
+        self._chunks = []
+        self._token = None
+        self._closed = asyncio.Event()
+
+    def __enter__(self):
+        ContextualStream.install()
+        self._token = _capture.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        _capture.reset(self._token)
+        self._closed.set()
+
+    @property
+    def closed(self):
+        return self._closed.is_set()
+
+    def write(self, text: str):
+        self._chunks.append(text)
+        return len(text)
+
+    def read(self):
+        """Returns and clears everything that has been captured so far."""
+
+        text = ''.join(self._chunks)
+        self._chunks.clear()
+        return text
+
+    async def stream(self, callback, *, interval: float = 1.0):
+        """Passes the captured output to an async callback in batches until the capture is exited.
+
+        Output that was written after the last batch is left for :meth:`read`.
+        """
+
+        while not self._closed.is_set():
+            try:
+                await asyncio.wait_for(self._closed.wait(), interval)
+            except asyncio.TimeoutError:
+                text = self.read()
+                if text:
+                    await callback(text)
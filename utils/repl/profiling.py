@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+
+"""
+Profiling of REPL code with cProfile and tracemalloc.
+"""
+
+import collections
+import cProfile
+import os.path
+import pstats
+import tracemalloc
+
+__all__ = ['FunctionStats', 'AllocationStats', 'Profiler', 'ProfilerBusy']
+
+FunctionStats = collections.namedtuple('FunctionStats', 'location calls total_time cumulative_time')
+AllocationStats = collections.namedtuple('AllocationStats', 'location size count')
+
+
+class ProfilerBusy(RuntimeError):
+    """Raised when a profile is requested while another one is being taken."""
+
+
+# profilers and tracemalloc are process-wide, so only one profile can be taken at a time
+_running = False
+
+
+class _Profiled:
+    """Wraps an awaitable so the profiler only runs while the awaitable itself executes.
+
+    This includes everything it awaits, but not other tasks that run in the meantime.
+    """
+
+    __slots__ = ('awaitable', 'profiler')
+
+    def __init__(self, awaitable, profiler: cProfile.Profile):
+        self.awaitable = awaitable
+        self.profiler = profiler
+
+    def __await__(self):
+        iterator = self.awaitable.__await__()
+        value, error = None, None
+
+        while True:
+            self.profiler.enable()
+            try:
+                if error is None:
+                    yielded = iterator.send(value)
+                else:
+                    yielded = iterator.throw(error)
+            except StopIteration as e:
+                return e.value
+            finally:
+                self.profiler.disable()
+
+            try:
+                value, error = (yield yielded), None
+            except BaseException as e:
+                value, error = None, e
+
+
+def _location(filename, lineno, name):
+    if filename == '~':  # built-in functions
+        return name
+
+    return f'{os.path.basename(filename)}:{lineno}({name})'
+
+
+class Profiler:
+    """Profiles the execution of an :class:`AsyncCodeExecutor`.
+
+    Memory allocations are traced with tracemalloc if ``memory`` is True. Unlike the
+    CPU profile, which only covers the executor, this includes allocations of other tasks.
+    """
+
+    def __init__(self, *, memory: bool = False):
+        self.memory = memory
+
+        self._profiler = cProfile.Profile()
+        self._snapshot = None
+
+    async def run(self, executor):
+        """Runs an executor and returns its results.
+
+        Raises :exc:`ProfilerBusy` if another profile is being taken at the moment.
+        """
+
+        global _running
+
+        if _running:
+            raise ProfilerBusy('Another profile is already being taken.')
+
+        _running = True
+        tracing = self.memory and not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+
+        results = []
+        try:
+            iterator = executor.__aiter__()
+            while True:
+                try:
+                    results.append(await _Profiled(iterator.__anext__(), self._profiler))
+                except StopAsyncIteration:
+                    break
+        finally:
+            _running = False
+            if self.memory:
+                self._snapshot = tracemalloc.take_snapshot().filter_traces((
+                    tracemalloc.Filter(False, tracemalloc.__file__),
+                    tracemalloc.Filter(False, __file__),
+                    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+                ))
+            if tracing:
+                tracemalloc.stop()
+
+        return results
+
+    def top_functions(self, sort: str = 'cumulative', limit: int = 15):
+        """Returns the functions that took the most time, sorted by ``cumulative`` or ``total`` time."""
+
+        stats = pstats.Stats(self._profiler).stats
+        index = 3 if sort == 'cumulative' else 2
+
+        return [
+            FunctionStats(_location(*function), calls, total_time, cumulative_time)
+            for function, (_, calls, total_time, cumulative_time, _) in
+            sorted(stats.items(), key=lambda item: item[1][index], reverse=True)[:limit]
+        ]
+
+    def top_allocations(self, limit: int = 10):
+        """Returns the source lines that allocated the most memory that is still alive."""
+
+        if self._snapshot is None:
+            return []
+
+        return [
+            AllocationStats(f'{os.path.basename(stat.traceback[0].filename)}:{stat.traceback[0].lineno}', stat.size, stat.count)
+            for stat in self._snapshot.statistics('lineno')[:limit]
+        ]
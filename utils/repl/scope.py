@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 
-import inspect
+import sys
 
 
 class Scope:
@@ -54,20 +54,21 @@ class Scope:
 def get_parent_scope_from_var(name, global_ok=False, skip_frames=0):
     """Iterates up the frame stack looking for a frame-scope containing the given variable name."""
 
-    stack = inspect.stack()
+    # walking the frames directly is a lot cheaper than inspect.stack(),
+    # which looks up the source file and context lines of every frame
     try:
-        for frame_info in stack[skip_frames + 1:]:
-            frame = None
+        frame = sys._getframe(skip_frames + 1)
+    except ValueError:  # the stack isn't that deep
+        return None
 
-            try:
-                frame = frame_info.frame
-                if name in frame.f_locals or (global_ok and name in frame.f_globals):
-                    return Scope(_globals=frame.f_globals, _locals=frame.f_locals)
-            finally:
-                del frame
+    try:
+        while frame is not None:
+            if name in frame.f_locals or (global_ok and name in frame.f_globals):
+                return Scope(_globals=frame.f_globals, _locals=frame.f_locals)
 
+            frame = frame.f_back
     finally:
-        del stack
+        del frame
 
     return None
 
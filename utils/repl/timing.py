@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+
+"""
+Micro-benchmarking of REPL code that may await coroutines.
+"""
+
+import ast
+import asyncio
+import collections
+import gc
+import math
+import statistics
+import textwrap
+import time
+
+import import_expression
+
+from .compilation import REPL_IMPORTS
+from .scope import Scope
+
+__all__ = ['Timer', 'TimingResult', 'format_duration']
+
+TIMEIT_CODE = """
+async def _timeit_inner(_timeit_number, _timeit_timer{{0}}):{0}
+    _timeit_start = _timeit_timer()
+    for _timeit_i in range(_timeit_number):
+        pass
+    return _timeit_timer() - _timeit_start
+""".format(textwrap.indent(REPL_IMPORTS, '    '))
+
+_SCOPES = (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda, ast.ClassDef)
+
+
+def _find_node(node, types):
+    """Returns the first node of the given types, not looking into nested functions and classes."""
+
+    for child in ast.iter_child_nodes(node):
+        if isinstance(child, types):
+            return child
+
+        if not isinstance(child, _SCOPES):
+            found = _find_node(child, types)
+            if found is not None:
+                return found
+
+    return None
+
+
+class TimingResult(collections.namedtuple('TimingResult', 'number timings')):
+    """The timings of every repeat of a benchmark, in seconds per loop."""
+
+    __slots__ = ()
+
+    @property
+    def min(self):
+        return min(self.timings)
+
+    @property
+    def median(self):
+        return statistics.median(self.timings)
+
+    @property
+    def p95(self):
+        # nearest rank
+        return sorted(self.timings)[math.ceil(0.95 * len(self.timings)) - 1]
+
+    @property
+    def stdev(self):
+        return statistics.stdev(self.timings) if len(self.timings) > 1 else 0.0
+
+
+def format_duration(seconds: float):
+    """Formats a duration with the unit that suits it best."""
+
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('\N{MICRO SIGN}s', 1e-6)):
+        if seconds >= scale:
+            return f'{seconds / scale:.3g} {unit}'
+
+    return f'{seconds / 1e-9:.3g} ns'
+
+
+class Timer:
+    """Times a statement that may await coroutines, similar to :class:`timeit.Timer`.
+
+    The statement is compiled once into a loop inside of an async function,
+    with the scope's globals as its globals and ``arg_dict`` as its arguments.
+    It can use the same names as code run by :class:`AsyncCodeExecutor`, but it
+    can't return or yield, as it would end the loop early.
+    """
+
+    def __init__(self, stmt: str, scope: Scope = None, arg_dict: dict = None, timer=time.perf_counter):
+        self.timer = timer
+        self.args = list((arg_dict or {}).values())
+
+        arg_names = ''.join(f', {name}' for name in arg_dict or ())
+        mod = import_expression.parse(TIMEIT_CODE.format(arg_names), mode='exec')
+
+        loop = mod.body[0].body[-2]  # for ...:
+        assert isinstance(loop, ast.For)
+
+        user_code = import_expression.parse(stmt, mode='exec')
+        invalid = _find_node(user_code, (ast.Return, ast.Yield, ast.YieldFrom))
+        if invalid is not None:
+            keyword = 'return' if isinstance(invalid, ast.Return) else 'yield'
+            raise SyntaxError(f"'{keyword}' can't be used in timed code", ('<timeit>', invalid.lineno, invalid.col_offset + 1, None))
+
+        loop.body = user_code.body or loop.body
+        # other tasks run whenever the statement awaits, so the garbage collector has to stay enabled for them
+        self.awaits = _find_node(user_code, (ast.Await, ast.AsyncFor, ast.AsyncWith)) is not None
+        ast.fix_missing_locations(mod)
+
+        namespace = {}
+        scope = scope or Scope()
+        exec(compile(mod, '<timeit>', 'exec'), scope.globals, namespace)
+        self._inner = namespace['_timeit_inner']
+
+    async def timeit(self, number: int):
+        """Returns the time it takes to run the statement ``number`` times, in seconds.
+
+        The garbage collector is disabled during the measurement unless the statement awaits.
+        """
+
+        gc_enabled = gc.isenabled() and not self.awaits
+        if gc_enabled:
+            gc.disable()
+        try:
+            return await self._inner(number, self.timer, *self.args)
+        finally:
+            if gc_enabled:
+                gc.enable()
+            # a statement that doesn't await blocks the event loop for the whole measurement
+            await asyncio.sleep(0)
+
+    async def autorange(self, target: float = 0.2, *, budget: float = 10.0):
+        """Finds a number of loops that takes at least ``target`` seconds, or stops once ``budget`` seconds are spent.
+
+        Returns the number of loops and the time they took.
+        """
+
+        scale = 1
+        spent = 0.0
+        while True:
+            for number in (scale, scale * 2, scale * 5):
+                elapsed = await self.timeit(number)
+                spent += elapsed
+                if elapsed >= target or spent >= budget:
+                    return number, elapsed
+
+            scale *= 10
+
+    async def repeat(self, repeat: int = 7, *, budget: float = 10.0):
+        """Auto-ranges the number of loops and runs it ``repeat`` times, or as often as ``budget`` seconds allow.
+
+        Repeats that would exceed the budget are skipped, so a slow statement might only be measured once.
+        """
+
+        start = time.perf_counter()
+        number, elapsed = await self.autorange(budget=budget)
+        timings = [elapsed / number]
+        spent = time.perf_counter() - start
+
+        while len(timings) < repeat and spent + elapsed <= budget:
+            elapsed = await self.timeit(number)
+            timings.append(elapsed / number)
+            spent += elapsed
+
+        return TimingResult(number, timings)